@@ -18,16 +18,19 @@
 # TTTech Industrial Automation AG, Schoenbrunnerstrasse 7, 1040 Vienna, Austria
 """Implementation of the control_workloads command."""
 
+import sys
 from nerveapi.utils import (
     load_json,
-    append_ending, ActionUnsuccessful)
+    plural, ActionUnsuccessful)
 from nerveapi.nodes import (
     control_workload,
     create_node_list_from_node_list,
     all_nodes_have_serial_numbers,
     all_workloads_have_device_ids
 )
+from nerveapi.session import MAX_PARALLEL_REQUESTS
 from json import JSONDecodeError
+from concurrent.futures import ThreadPoolExecutor
 
 
 def handle_start_workloads(args):
@@ -51,16 +54,16 @@ def handle_restart_workloads(args):
 def handle_control_workloads(action, args):
     """Implementation of the control_workloads command."""
     #
-    input_filename = append_ending(args.input_file, ".json")
+    input_filename = args.input_file
     try:
         node_list = load_json(input_filename)
     except JSONDecodeError as e:
         print("Could not read input file. ")
         print(e)
-        return
+        return 1
     except FileNotFoundError:
         print(f"File {input_filename} not found.")
-        return
+        return 1
 
     if ((not all_nodes_have_serial_numbers(node_list)) or
             (not all_workloads_have_device_ids(node_list))):
@@ -70,33 +73,54 @@ def handle_control_workloads(action, args):
         node_list = create_node_list_from_node_list(node_list, True, args.verbose)
     # Now all data (serial_number and device_id ) needed to control should be available.
 
-    if len(node_list) > 1:
+    # The device ids are indexed by the serial number of their node. The workloads of all entries of a node listed
+    # more than once in the input are thereby merged, and each workload is controlled only once.
+    device_ids_by_node = {}
+    for node in node_list:
+        device_ids = device_ids_by_node.setdefault(node["serial_number"], {})
+        for wl in node.get("workloads"):
+            device_ids[wl["device_id"]] = None
+    targets = [(serial_number, device_id)
+               for serial_number, device_ids in device_ids_by_node.items() for device_id in device_ids]
+
+    if len(targets) > 1 and not args.yes:
+        if not sys.stdin.isatty():
+            print("Not running interactively, cannot ask for confirmation. Use --yes to proceed.")
+            return 1
         confirmation = input(
-            f"This will {action} {len(node_list)} workloads. Are you sure? (y/n): ")
+            f"This will {action} {len(targets)} workloads. Are you sure? (y/n): ")
         if confirmation.lower() != 'y':
-            return
+            return 1
+
+    verbose = args.verbose
 
+    def control(target):
+        serial_number, device_id = target
+        if (verbose):
+            print(f"Will {action} workload {device_id} on {serial_number}.")
+        try:
+            control_workload(action, serial_number, device_id)
+            return (True, None)
+        except ActionUnsuccessful as e:
+            return (False, e)
+
+    # The control commands are independent of each other, so they are sent in parallel.
     count = 0
     failed = 0
-    for node in node_list:
-        for wl in node.get("workloads"):
-
-            if (args.verbose):
-                print(
-                    f"Will {action} workload {wl['device_id']} on {node['serial_number']}.")
-                
-            try:
-                control_workload(action, node["serial_number"], wl["device_id"])
-                count += 1
-            except ActionUnsuccessful as e:
-                failed += 1
-                print(e)
+    if targets:
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_REQUESTS, len(targets))) as executor:
+            for ok, error in executor.map(control, targets):
+                if ok:
+                    count += 1
+                else:
+                    failed += 1
+                    print(error)
 
     if failed:
         print(f"Succeeded to initialize '{action}' command on", count,
-              f"workload{'s'[:count!=1]}, failed on", failed, ".")
+              f"workload{plural(count)}, failed on", failed, ".")
     elif count == 0:
         print("No workloads to control.")
     else:
         print(f"Succeded to initialize '{action}'  command on all workloads.")
-    return count
+    return 1 if failed else 0
@@ -30,4 +30,5 @@ def handle_create_label(args):
         print("Label created.")
     except ActionUnsuccessful as e:
         print("Failed to create label. Server responded:",e)
-        return
+        return 1
+    return 0
@@ -19,10 +19,9 @@
 """Implementation of the create_wl_template command."""
 
 from nerveapi.workloads import get_workload_info
-from nerveapi.utils import load_json, append_ending, ActionUnsuccessful, DataNotAsExpected, complainIfKeysAreNotInDict
+from nerveapi.utils import load_json, save_json, ActionUnsuccessful, DataNotAsExpected
 from nerveapi.datastructures import create_workload_definition_from_json
 from dataclasses import asdict
-import json
 from json import JSONDecodeError
 
 
@@ -43,37 +42,36 @@ def handle_create_wl_template(args):
             and a 'verbose' attribute to control verbose output.
 
     Returns:
-    - None: The function writes the resulting template to a file and does not return a value.
+    - int: The exit code of the command, 0 if the template was written, 1 otherwise.
     """
     #    
-    input_filename = append_ending(args.input_file, ".json")
-    output_filename = append_ending(args.output_file, ".json")
+    input_filename = args.input_file
+    output_filename = args.output_file
     try:
         wl_list = load_json(input_filename)
     except JSONDecodeError as e:
         print("Could not read input file. ")
         print(e)
-        return
+        return 1
     except FileNotFoundError:
         print(f"File {input_filename} not found.")
-        return
+        return 1
     except OSError:
         print(f"Could not open file {input_filename}.")
-        return
+        return 1
 
     if len(wl_list) > 1:
         print("Multiple workloads in the input list."+
               "The template will be created only from the first one.")
 
     wl = wl_list[0]
-    try:
-        complainIfKeysAreNotInDict(wl, ["_id", "versions"])
-    except DataNotAsExpected:
+    if {"_id", "versions"} - wl.keys():
         print("The workload in the input list does have the expected format. _id or versions is missing.")
-        return
+        return 1
 
-    if args.verbose and len(wl.get('versions')) > 1:
-        print(f"The workload in the input list has {len(wl.get('versions'))} versions.")
+    versions = wl["versions"]
+    if args.verbose and len(versions) > 1:
+        print(f"The workload in the input list has {len(versions)} versions.")
 
     # The workload info is needed to get the id of the workload, to see if we 
     # add to the workload or create a new one
@@ -81,27 +79,28 @@ def handle_create_wl_template(args):
     if (args.verbose):
         print(f"Getting workload info for {wl.get('name')} with id {wl.get('_id')}.")
     try:
-        wl_info = get_workload_info(_id=wl["_id"], versions=wl.get("versions"))
+        wl_info = get_workload_info(_id=wl["_id"], versions=versions)
     except ActionUnsuccessful as e:
         print(e)
-        return
+        return 1
 
-    if wl_info["type"] != "docker":
-        print(f"Workload type {wl_info['type']} is not yet supported.")
-        return
+    wl_type = wl_info["type"]
+    if wl_type != "docker":
+        print(f"Workload type {wl_type} is not yet supported.")
+        return 1
 
     try:
         wl_def_as_dict = rewrite_original_source_definition(wl_info)
         wl_def = create_workload_definition_from_json(wl_def_as_dict)
     except DataNotAsExpected as e:
         print(e)
-        return
+        return 1
 
 
-    with open(output_filename, 'w') as output_file:
-        json.dump(asdict(wl_def), output_file, indent=4)
-        print(f"Template saved to {output_filename}.")
-    return asdict(wl_def)
+    template = asdict(wl_def)
+    save_json(template, output_filename)
+    print(f"Template saved to {output_filename}.")
+    return 0
 
 # Takes a json and sees it contains the way the source is defined in the MS.
 # Since we use a simplified defintion, this rewrites the definition in order to be interpretable
@@ -123,15 +122,15 @@ def rewrite_original_source_definition(wl_info_dict):
       simplified format. This dictionary is suitable for use in creating workload templates.
     """
     #
-    for version in wl_info_dict["versions"]:
-        if version["dockerFileOption"] == "path":
-
-            version["source"] = {"path": version["dockerFilePath"]}
-
-            if auth_credentials := version.get("auth_credentials"):
-                version["source"]["auth_credentials"] = auth_credentials
+    def source_of(version):
+        docker_file_option = version["dockerFileOption"]
+        if docker_file_option != "path":
+            raise DataNotAsExpected(f"Docker Option {docker_file_option} is not yet supported.")
 
-        else:
-            raise DataNotAsExpected(f"Docker Option {version['dockerFileOption']} is not yet supported.")
+        source = {"path": version["dockerFilePath"]}
+        if auth_credentials := version.get("auth_credentials"):
+            source["auth_credentials"] = auth_credentials
+        return source
 
+    wl_info_dict["versions"] = [version | {"source": source_of(version)} for version in wl_info_dict["versions"]]
     return wl_info_dict
@@ -18,8 +18,8 @@
 # TTTech Industrial Automation AG, Schoenbrunnerstrasse 7, 1040 Vienna, Austria
 """Implementation of the create_workload command."""
 
-import json
-from nerveapi.utils import append_ending, ActionUnsuccessful
+from json import JSONDecodeError
+from nerveapi.utils import load_json, ActionUnsuccessful
 from nerveapi.datastructures import create_workload_definition_from_json
 from nerveapi.workloads import create_workload_in_ms
 
@@ -28,23 +28,25 @@ def handle_create_workload(args):
     """Implementation of the create_workload command."""
     #
     template = {}
-    filename = append_ending(args.template, ".json")
+    filename = args.template
     try:
-        with open(filename, 'r') as file:
-            template = json.load(file)
+        template = load_json(filename)
     except FileNotFoundError:
         print(
             f"File {filename} not found.")
-        return
-    except json.JSONDecodeError:
+        return 1
+    except OSError:
+        print(f"Could not open file {filename}.")
+        return 1
+    except JSONDecodeError:
         print(f"File {filename} does not contain valid JSON.")
-        return
+        return 1
 
     try:
         workload_definition = create_workload_definition_from_json(template)
     except Exception as e:
         print(f"Error creating workload definition from template file: {e}")
-        return
+        return 1
     
     if args.verbose:
         print(f"Creating workload {workload_definition.name}.")
@@ -55,7 +57,8 @@ def handle_create_workload(args):
                               sequential=args.sequential, verbose=args.verbose)
     except ActionUnsuccessful as e:
         print(e)
-        return
+        return 1
     
     print("Workload created.")
+    return 0
     
@@ -18,16 +18,21 @@
 # TTTech Industrial Automation AG, Schoenbrunnerstrasse 7, 1040 Vienna, Austria
 """Implementation of the delete label command."""
 
-from nerveapi.labels import delete_label
-from nerveapi.utils import ActionUnsuccessful
+from nerveapi.labels import delete_labels
 
 def handle_delete_label(args):
     """Implementation of the create_label command."""
     print("Labels operation are in beta stage.")
 
-    try:
-        delete_label(_id=args.id)
-        print("Deleted")
-    except ActionUnsuccessful as e:
-        print("Failed to delete label.",e)
-        return
+    if not args.id:
+        print("Failed to delete label. Please enter the label ID.")
+        return 1
+
+    failed = False
+    for _id, error in zip(args.id, delete_labels(args.id)):
+        if error is None:
+            print("Deleted" if len(args.id) == 1 else f"Deleted {_id}")
+        else:
+            print(f"Failed to delete label {_id}.", error)
+            failed = True
+    return 1 if failed else 0
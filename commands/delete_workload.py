@@ -18,41 +18,64 @@
 # TTTech Industrial Automation AG, Schoenbrunnerstrasse 7, 1040 Vienna, Austria
 """Implementation of the delete_workload command."""
 
+import sys
 from nerveapi.workloads import delete_workload_from_ms
-from nerveapi.utils import load_json, append_ending, ActionUnsuccessful
+from nerveapi.session import MAX_PARALLEL_REQUESTS
+from nerveapi.utils import load_json, ActionUnsuccessful
 from json import JSONDecodeError
+from concurrent.futures import ThreadPoolExecutor
 
 
 def handle_delete_workload(args):
     """Implementation of the delete_workload command."""
     #
     try:
-        filename = append_ending(args.input_file, ".json")
+        filename = args.input_file
         wl_list = load_json(filename)
     except JSONDecodeError as e:
         print("Could not read input file. ")
         print(e)
-        return
+        return 1
     except FileNotFoundError:
         print(f"File {filename} not found.")
-        return
+        return 1
     except OSError:
         print(f"Could not open file {filename}.")
-        return
+        return 1
+
+    # Workloads listed more than once in the input are deleted only once.
+    unique_workloads = []
+    seen = set()
+    for wl in wl_list:
+        if wl["_id"] not in seen:
+            seen.add(wl["_id"])
+            unique_workloads.append(wl)
+    wl_list = unique_workloads
 
     if len(wl_list) > 1 and not args.yes:
+        if not sys.stdin.isatty():
+            print("Not running interactively, cannot ask for confirmation. Use --yes to proceed.")
+            return 1
         confirmation = input(
             f"This will delete {len(wl_list)} items. Are you sure? (y/n): ")
         if confirmation.lower() != 'y':
-            return
+            return 1
 
-    result = []
-    for wl in wl_list:
-        if (args.verbose):
+    verbose = args.verbose
+
+    def try_delete(wl):
+        if (verbose):
             print(f"Deleting workload {wl['name']} with id {wl['_id']}.")
         try:
-            result.append(delete_workload_from_ms(
-                wl["_id"], verbose=args.verbose))
+            return delete_workload_from_ms(wl["_id"], verbose=verbose)
         except ActionUnsuccessful as e:
             print(e)
+            return None
+
+    # The deletions are independent of each other, so they are sent in parallel.
+    result = []
+    if wl_list:
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_REQUESTS, len(wl_list))) as executor:
+            result = [_id for _id in executor.map(try_delete, wl_list) if _id is not None]
     print("Deleted: ", result)
+    return 0 if len(result) == len(wl_list) else 1
@@ -33,8 +33,8 @@ def handle_get_labels(args):
         pprint(labels)
     except ActionUnsuccessful as e:
         print("Failed to get labels.",e)
-        return
+        return 1
     except DataNotAsExpected as e:
         print("Failed to get labels. Data seems wrong.",e)
-        return
-    return labels
+        return 1
+    return 0
@@ -19,10 +19,10 @@
 """Implementation of the list_nodes command."""
 
 from nerveapi.nodes import create_node_list, filter_node_list
-from nerveapi.nodes import get_deployed_workloads_from_node, filter_node_list_for_wl
-from nerveapi.utils import ActionUnsuccessful, load_json, save_json, append_ending
+from nerveapi.nodes import get_deployed_workloads_from_nodes, filter_node_list_for_wl
+from nerveapi.utils import ActionUnsuccessful, DataNotAsExpected, save_json, append_json, plural
+from nerveapi.utils import load_session_id, load_cache, save_cache
 from nerveapi.labels import get_labels
-from json import JSONDecodeError
 
 
 def handle_list_nodes(args):
@@ -30,21 +30,35 @@ def handle_list_nodes(args):
     #
     # for the moment this is quite inefficient.
     # First, it gets a list of all nodes.
-    # In order to do that we need the labels first
-
-    try:
-        ms_labels = get_labels()
-    except ActionUnsuccessful as e:
-        print(e)
-        return
+    # In order to do that we need the labels first.
+    # The node list can be taken from the cache if it has been fetched recently. It already holds the labels in
+    # clear text. If it is fetched again, so are the labels, as the nodes may refer to labels which were added since.
+
+    # What a user sees of the node tree depends on the user, so the cache is kept per MS and login session.
+    (session_id, base_url) = load_session_id()
+    cache_key = f"{base_url} {session_id}"
+    node_list = None
+    if args.cache_ttl > 0:
+        node_list = load_cache("nodes", cache_key, args.cache_ttl)
+        if node_list is not None and args.verbose:
+            print("Using cached node list.")
+
+    if node_list is None:
+        try:
+            ms_labels = get_labels()
+        except ActionUnsuccessful as e:
+            print(e)
+            return 1
 
-    if (args.verbose):
-        print("Starting node list.")
-    try:
-        node_list = create_node_list(args.verbose, ms_labels)
-    except ActionUnsuccessful as e:
-        print(e)
-        return
+        if (args.verbose):
+            print("Starting node list.")
+        try:
+            node_list = create_node_list(args.verbose, ms_labels)
+        except (ActionUnsuccessful, DataNotAsExpected) as e:
+            print(e)
+            return 1
+        if args.cache_ttl > 0:
+            save_cache("nodes", cache_key, node_list)
 
     if (args.verbose):
         print("Node list created. Has", len(node_list), " nodes.")
@@ -64,27 +78,26 @@ def handle_list_nodes(args):
             " This may take a while. Consider using more specific node filters.")
 
     if (args.verbose):
-        print("Filtered for node criteria. List now has",
-              len(node_list), " nodes.")
-        print("Getting workload data.")
+        print(f"Filtered for node criteria. List now has {len(node_list)} nodes.\n"
+              "Getting workload data.")
 
 
 # Now add workload info for the online ones.
     online_nodes = []
     offline_nodes = []
 
-    for index in range(len(filtered_list)):
-        if (filtered_list[index]["connection_status"] == "online"):
-            if args.verbose:
-                print("Getting workloads for node",
-                      filtered_list[index]["name"])
-            dwl = get_deployed_workloads_from_node(
-                filtered_list[index]["serial_number"])
-            node = filtered_list[index]
-            node["workloads"] = dwl
-            online_nodes.append(node)
-        else:
-            offline_nodes.append(filtered_list[index])
+    for node in filtered_list:
+        (online_nodes if node["connection_status"] == "online" else offline_nodes).append(node)
+
+    if args.verbose:
+        for node in online_nodes:
+            print("Getting workloads for node", node["name"])
+
+    # The nodes are queried in parallel, as each request is independent.
+    deployed_workloads = get_deployed_workloads_from_nodes(
+        [node["serial_number"] for node in online_nodes])
+    for node, dwl in zip(online_nodes, deployed_workloads):
+        node["workloads"] = dwl
 
 # Now filter for workload properties, if any workloads filters are specified.
     if (args.workload_name or
@@ -106,55 +119,45 @@ def handle_list_nodes(args):
         filtered_for_wl = online_nodes
 
     if args.verbose:
-        print("Complete.")
-        print("The system has a total of", len(node_list), " nodes.")
-        print("Of those,", len(filtered_list),
-              "nodes match the filter criteria regarding nodes.")
-        print("Of those,", len(online_nodes), "nodes are online,",
-              len(offline_nodes), "nodes are offline.")
-        print("Of the online nodes,", len(filtered_for_wl),
-              "nodes match the filter criteria regarding workloads.")
+        print("Complete.\n"
+              f"The system has a total of {len(node_list)} nodes.\n"
+              f"Of those, {len(filtered_list)} nodes match the filter criteria regarding nodes.\n"
+              f"Of those, {len(online_nodes)} nodes are online, {len(offline_nodes)} nodes are offline.\n"
+              f"Of the online nodes, {len(filtered_for_wl)} nodes match the filter criteria regarding workloads.")
 
     if args.human:
-        print("")
-        print("")
-        print("Found following nodes and workloads:")
-        print("")
+        # The output is collected and written at once, instead of one print per line.
+        lines = ["", "", "Found following nodes and workloads:", ""]
         for node in filtered_for_wl:
-            print(f"Node path: {'/'.join(node['path'])}   Name:{node['name']}   Model:{node['model']}"+
-                  f"   Version:{node['version']}")
+            lines.append(f"Node path: {'/'.join(node['path'])}   Name:{node['name']}   Model:{node['model']}"+
+                         f"   Version:{node['version']}")
             for wl in node['workloads']:
-                print(
-                    f"   Workload: {wl['name']}/{wl['version_name']} ({wl['state']})")
-            print("")
+                lines.append(f"   Workload: {wl['name']}/{wl['version_name']} ({wl['state']})")
+            lines.append("")
+        print("\n".join(lines))
 
-    filename = append_ending(args.file_name, ".json")
+    filename = args.file_name
+
+    if len(filtered_for_wl) == 0:
+        print("No nodes/workloads found matching the criteria.")
 
-    result_list = []
     if args.add:
         if args.verbose:
-            print(f"Adding was specified. Therefore reading existing data from input file {filename}.")
+            print(f"Adding was specified. Therefore appending to the existing data in file {filename}.")
         try:
-            result_list = load_json(filename)
-        except JSONDecodeError:
+            if append_json(filtered_for_wl, filename):
+                print(f"Added {len(filtered_for_wl)} node{plural(len(filtered_for_wl))} to result file {filename}.")
+                return 0
             print(
-                f"File {filename} is not a valid JSON file. Ignoring the file as input, creating a new list.")
+                f"File {filename} does not contain a JSON list. Ignoring the file as input, creating a new list.")
         except OSError:
             print(
                 f"Error reading file {filename}. Ignoring the file as input, creating a new list.")
 
-    if result_list is None:
-        print(
-            "Input file {filename} is not found, empty or not a valid JSON file. Creating a new list.")
-        result_list = []
-
-    if len(filtered_for_wl) == 0:
-        print("No nodes/workloads found matching the criteria.")
-
-    result_list.extend(filtered_for_wl)
+    result_list = filtered_for_wl
     if args.verbose:
         print(f"Writing to file {filename}.")
     save_json(result_list, filename)
-    print(f"Created result file {filename} with {len(result_list)} node{'s'[:len(result_list)!=1]}.")
-    return result_list
+    print(f"Created result file {filename} with {len(result_list)} node{plural(len(result_list))}.")
+    return 0
 # Path: src/commands/control_workloads.py
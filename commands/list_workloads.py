@@ -18,9 +18,13 @@
 # TTTech Industrial Automation AG, Schoenbrunnerstrasse 7, 1040 Vienna, Austria
 """Implementation of the list_workloads command."""
 
-from nerveapi.workloads import list_workloads, filter_workloads, get_workload_info
+from nerveapi.workloads import list_workloads, filter_workloads, select_versions, get_workload_infos
 from nerveapi.utils import save_json
-from nerveapi.utils import append_ending, ActionUnsuccessful, DataNotAsExpected
+from nerveapi.utils import append_ending, ActionUnsuccessful, plural
+
+# Workload types for which details can be fetched.
+# TODO add more when supporting the other types
+SUPPORTED_TYPES = frozenset({"docker", "codesys", "vm"})
 
 
 def handle_workloads_list(args):
@@ -38,8 +42,7 @@ def handle_workloads_list(args):
     - args: A namespace object from argparse containing the command-line arguments.
     
     Returns:
-    - A list of Workload_Information objects, each potentially enriched with detailed information based on 
-    the command-line arguments.
+    - int: The exit code of the command, 0 if the workloads were listed, 1 otherwise.
     """
     #
 
@@ -48,7 +51,7 @@ def handle_workloads_list(args):
         workload_list = list_workloads(args.verbose)
     except ActionUnsuccessful as e:
         print(e)
-        return
+        return 1
 
 # filtering. Version details can only be filtered in the next go
     result = filter_workloads(workload_list,
@@ -62,30 +65,25 @@ def handle_workloads_list(args):
         print(f"Of those, {len(result)} workloads matched the filter criteria.")
         print("Now fetching details.")
 
-    found_unsupported = False
-    for i in range(len(result)):
-        try:
-            # TODO add more when supporting the other types
-            if   (result[i]["type"] == "docker" 
-                  or result[i]["type"] == "codesys" 
-                  or result[i]["type"] == "vm"
-                  ):
-                if (args.verbose):
-                    print(f"Fetching details for {result[i]['name']}.")
-                result[i] = get_workload_info(_id=result[i]["_id"])
-            else: 
-                found_unsupported = True                
-        except ActionUnsuccessful as e:
-            print(e)
+    # Details are fetched in parallel. Workloads whose details could not be fetched keep their summary entry.
+    supported = [wl for wl in result if wl["type"] in SUPPORTED_TYPES]
+    found_unsupported = len(supported) < len(result)
+    if args.verbose:
+        for wl in supported:
+            print(f"Fetching details for {wl['name']}.")
+    details = {}
+    for _id, outcome in get_workload_infos([wl["_id"] for wl in supported]).items():
+        if isinstance(outcome, ActionUnsuccessful):
+            print(outcome)
+        else:
+            details[_id] = outcome
     if found_unsupported:
         print("Some workloads are of unsupported type. Their details are not complete.")
 
-# result is now a list of Workload_Information objects, not yet filtered by version properties
-    try:
-        result = filter_workloads(result, version_name=args.version_name)
-    except DataNotAsExpected as e:
-        print("Error filtering the workloads: " + str(e))
-        return
+# Version details are only known now, so the version filter is applied in the same pass that merges the details.
+    version_name = args.version_name
+    result = [selected for wl in result
+              if (selected := select_versions(details.get(wl["_id"], wl), version_name=version_name))]
 
 # result is now a list of Workload_Information objects.
 
@@ -97,9 +95,9 @@ def handle_workloads_list(args):
 
     if output_filename:
         save_json(result, output_filename)
-        print(f"Saved result to {output_filename}. Contains {len(result)} workload{'s'[:len(result)!=1]}.")
+        print(f"Saved result to {output_filename}. Contains {len(result)} workload{plural(len(result))}.")
 
-    return result
+    return 0
 
 def __print_human(workload_list):
     if len(workload_list) == 0:
@@ -108,11 +106,12 @@ def __print_human(workload_list):
     for workload in workload_list:
         if not workload:
             continue
-        print(f"Workload: {workload['name']} ({workload['type']})")
-        if (workload.get("versions") and len(workload['versions'])):
-            for version in workload['versions']:
-                if (workload['type'] == "docker"):
-                    print(f"   Version: {version['name']}    "+
-                          f" Container name: {version['workloadProperties']['container_name']}")
-                else:
-                    print(f"   Version:{version['name']}")
\ No newline at end of file
+        wl_type = workload.get("type")
+        print(f"Workload: {workload['name']} ({wl_type})")
+        is_docker = wl_type == "docker"
+        for version in workload.get("versions") or []:
+            if is_docker:
+                print(f"   Version: {version['name']}    "+
+                      f" Container name: {version['workloadProperties']['container_name']}")
+            else:
+                print(f"   Version:{version['name']}")
\ No newline at end of file
@@ -39,4 +39,6 @@ def handle_logout(args):
     except ActionUnsuccessful as e:
         # If logout fails (e.g., due to a lost connection or session timeout), print the error.
         print(f"Logout failed: {e}")
+        return 1
+    return 0
 
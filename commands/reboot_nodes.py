@@ -18,15 +18,18 @@
 # TTTech Industrial Automation AG, Schoenbrunnerstrasse 7, 1040 Vienna, Austria
 """Implementation of the reboot_nodes command."""
 
+import sys
 from nerveapi.utils import (
     load_json,
-    append_ending, ActionUnsuccessful)
+    plural, ActionUnsuccessful)
 from nerveapi.nodes import (
     reboot_node,
     create_node_list_from_node_list,
     all_nodes_have_serial_numbers
 )
+from nerveapi.session import MAX_PARALLEL_REQUESTS
 from json import JSONDecodeError
+from concurrent.futures import ThreadPoolExecutor
 
 
 def handle_reboot_nodes(args):
@@ -46,24 +49,24 @@ def handle_reboot_nodes(args):
             to control verbose output.
 
     Returns:
-    - None: The function prints the outcome of the reboot operation(s) to the console and does not
-            return a value. It shows the count of successfully rebooted nodes and, if applicable,
-            the number of nodes that failed to reboot.
+    - int: The exit code of the command, 0 if all nodes were rebooted, 1 otherwise. The outcome of the reboot
+           operation(s) is printed to the console. It shows the count of successfully rebooted nodes and, if
+           applicable, the number of nodes that failed to reboot.
     """
     #
-    filename = append_ending(args.input_file, ".json")
+    filename = args.input_file
     try:
         node_list = load_json(filename)
     except JSONDecodeError as e:
         print("Could not read input file. ")
         print(e)
-        return
+        return 1
     except FileNotFoundError:
         print(f"File {filename} not found.")
-        return
+        return 1
     except OSError:
         print(f"Could not open file {filename}.")
-        return
+        return 1
 
     if not all_nodes_have_serial_numbers(node_list):
         if args.verbose:
@@ -71,24 +74,49 @@ def handle_reboot_nodes(args):
                 "Not all nodes have serial numbers. Fetching serial numbers. Trying to recreate tree.")
         node_list = create_node_list_from_node_list(node_list)
 
+    # Nodes listed more than once in the input are rebooted only once.
+    unique_nodes = []
+    seen = set()
+    for node in node_list:
+        if node["serial_number"] not in seen:
+            seen.add(node["serial_number"])
+            unique_nodes.append(node)
+    node_list = unique_nodes
+
     if len(node_list) > 1 and not args.yes:
+        if not sys.stdin.isatty():
+            print("Not running interactively, cannot ask for confirmation. Use --yes to proceed.")
+            return 1
         confirmation = input(
             f"This will reboot {len(node_list)} nodes. Are you sure? (y/n): ")
         if confirmation.lower() != 'y':
-            return
+            return 1
 
-    count = 0
-    for node in node_list:
-        if (args.verbose):
+    verbose = args.verbose
+
+    def reboot(node):
+        if (verbose):
             print(f"Rebooting node {node['name']} with id {node['_id']}.")
         try:
             reboot_node(node["serial_number"])
-            count += 1
+            return (True, None)
         except ActionUnsuccessful as e:
-            print(str(e))
+            return (False, e)
+
+    # The reboots are independent of each other, so they are sent in parallel.
+    count = 0
+    if node_list:
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_REQUESTS, len(node_list))) as executor:
+            for ok, error in executor.map(reboot, node_list):
+                if ok:
+                    count += 1
+                else:
+                    print(str(error))
 
     if count < len(node_list):
-        print(f"Rebooted {count} node{'s'[:count!=1]}, failed to reboot {len(node_list) - count} "+
-              f"node{'s'[:(len(node_list) - count)!=1]}.")
+        print(f"Rebooted {count} node{plural(count)}, failed to reboot {len(node_list) - count} "+
+              f"node{plural(len(node_list) - count)}.")
     else:
         print("Rebooted all nodes.")
+        return 0
+    return 1
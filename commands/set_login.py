@@ -25,8 +25,7 @@ This module is a part of the TTTech Industrial Automation AG's nerveapi package,
 interacting with the Nerve management system.
 """
 import os
-import getpass
-import validators
+import re
 
 from nerveapi.session import (
     login,
@@ -36,9 +35,18 @@ from nerveapi.utils import (
     save_session_id,
     ActionUnsuccessful,
     load_credentials_from_file,
-    save_credentials
+    save_credentials,
+    load_cache,
+    save_cache
 )
-from nerveapi.utils import append_ending, DataNotAsExpected
+from nerveapi.utils import DataNotAsExpected
+
+# Plausibility checks for the login data, the MS itself decides whether the credentials are valid.
+_URL_RE = re.compile(r'^https?://[^\s/$.?#].[^\s]*$', re.IGNORECASE)
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# Seconds for which the cached version of a management system is used.
+MS_VERSION_MAX_AGE = 24 * 60 * 60
 
 
 def handle_set_login(args):
@@ -58,7 +66,7 @@ def handle_set_login(args):
     command-line arguments.
 
     Returns:
-    None: The function primarily prints to console and saves session information, without returning any value.
+    int: The exit code of the command, 0 if the login was successful, 1 otherwise.
     """
     # Try fetching credentials from command-line arguments
     url = None
@@ -79,21 +87,25 @@ def handle_set_login(args):
     if password: 
         print("Password found in command-line arguments.")
 
-    if not url and os.getenv('NERVE_URL'):
-        url = os.getenv('NERVE_URL')
+    env = os.environ
+    env_url = env.get('NERVE_URL')
+    if not url and env_url:
+        url = env_url
         print("URL found in environment variable:", url)
 
-    if not username and os.getenv('NERVE_USERNAME'):
-        username = os.getenv('NERVE_USERNAME')
+    env_username = env.get('NERVE_USERNAME')
+    if not username and env_username:
+        username = env_username
         print("Username found in environment variables:", username)
 
-    if not password and os.getenv('NERVE_PASSWORD'):
-        password = os.getenv('NERVE_PASSWORD')
+    env_password = env.get('NERVE_PASSWORD')
+    if not password and env_password:
+        password = env_password
         print("Password found in environment variable.")
 
     if not url or not username or not password:
         try:
-            filename = append_ending(args.file, ".ini")
+            filename = args.file
             url_from_file, username_from_file, password_from_file = load_credentials_from_file(
                 filename)
 
@@ -114,10 +126,6 @@ def handle_set_login(args):
 
 
     url = url if url else input("Enter the Nerve management system URL: ")
-    url = url.rstrip('/')       # The MS doesnt like a slash.
-    # add https:// if not present
-    if not url.startswith("http"):
-        url = "https://" + url
 
     prompted_for_username = False
     if not username:
@@ -126,15 +134,23 @@ def handle_set_login(args):
 
     prompted_for_password = False
     if not password:
+        import getpass  # Only needed when prompting, so it is not imported for every invocation.
         password = getpass.getpass("Enter your password: ")
         prompted_for_password = True
 
-    if not validators.url(url): 
+    if not (url and username and password):
+        print("Missing credentials. URL, username and password are required.")
+        return 1
+
+    # The MS doesnt like a trailing slash. Add https:// if no scheme is given.
+    url = url.rstrip('/') if url.startswith("http") else "https://" + url.rstrip('/')
+
+    if not _URL_RE.match(url):
         print("Invalid URL provided.")
-        return
-    if not validators.email(username):
+        return 1
+    if not _EMAIL_RE.match(username):
         print("Invalid username provided. Nerve usernames are email addresses.")
-        return
+        return 1
 
     session_id = None
     try:
@@ -142,7 +158,7 @@ def handle_set_login(args):
         save_session_id(session_id, url)
     except ActionUnsuccessful as e:
         print(f"Login failed: {e}")
-        return
+        return 1
 
     print("Login successful.")
 
@@ -165,21 +181,26 @@ def handle_set_login(args):
 
 
 
-    try:
-        version = get_ms_version()
-    except DataNotAsExpected as e:
-        print(
-            f"Warning: Could not determine the version of the management system. {e}")
-        return
-    except ActionUnsuccessful as e:
-        print(f"Warning: Could not determine the version of the management system. {e}")
-        return
+    # The version only changes with an update of the MS, so it is reused for a day. It is kept in the cache
+    # directory instead of the credentials file, which is optional. The successful login above already shows that
+    # the MS is reachable. After an update of the MS, the old version is reported until the cached one expires.
+    # Caching is best effort, see save_cache.
+    version = load_cache("ms_version", url, MS_VERSION_MAX_AGE)
+    if version is None:
+        try:
+            version = get_ms_version()
+        except DataNotAsExpected as e:
+            print(
+                f"Warning: Could not determine the version of the management system. {e}")
+            return 0
+        except ActionUnsuccessful as e:
+            print(f"Warning: Could not determine the version of the management system. {e}")
+            return 0
+        save_cache("ms_version", url, version)
 
     if (version not in ["2.8.0", "2.8.1"]):
-        print("")
-        print("Warning: This tool was tested with version 2.8.0 (and newer) of the Nerve management system."+
-              " It may not work with older versions.")
-        print("Your management system is running version", version, ".")
+        print("\nWarning: This tool was tested with version 2.8.0 (and newer) of the Nerve management system."+
+              f" It may not work with older versions.\nYour management system is running version {version} .")
 
-    print()
-    print("Set login to", url, "with version", version, "as", username, ".")
+    print(f"\nSet login to {url} with version {version} as {username} .")
+    return 0
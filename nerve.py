@@ -19,36 +19,47 @@
 """Main Command Line Interface."""
 
 import argparse
-from commands.set_login import handle_set_login
-from commands.logout import handle_logout
-from commands.list_workloads import handle_workloads_list 
-from commands.create_workload import handle_create_workload
-from commands.create_label import handle_create_label
-from commands.get_labels import handle_get_labels
-from commands.delete_label import handle_delete_label
-from commands.delete_workload import handle_delete_workload
-from commands.create_wl_template import handle_create_wl_template
-from commands.list_nodes import handle_list_nodes
-from commands.reboot_nodes import handle_reboot_nodes
-from commands.control_workloads import (
-    handle_start_workloads,
-    handle_stop_workloads,
-    handle_restart_workloads
-)
+import functools
+import importlib
+import os
 import sys
-from argparse import RawTextHelpFormatter
+from nerveapi.utils import append_ending
+
+__all__ = ["main"]
 
 help_text = """
-Nerve Management System CLI
-available commands:
-  set_login
-  login
-  logout
+usage: nerve <command> [options]
 
-use 'nerve <command> --Help' for more information about a command.  
+available commands:
+  set_login           Checks and sets login credentials. Uses file, enviroment vars or propmt.
+  logout              Log out and delete session data.
+  list_workloads      List workloads and store them.
+  create_workload     Create a new workload.
+  create_label        Create a new label.
+  get_labels          List the labels in the system.
+  delete_label        Delete a label.
+  create_wl_template  Creates a workload defintion template from the first workload in the workload list.
+  delete_workloads    Delete workloads from a workload list file. Use list_workloads to create a list file.
+  list_nodes          List nodes and create a node list or add to the list. See the functions help for more information.
+  reboot_nodes        Reboot nodes from a node list file.  See list_nodes help for details.
+  start               Start workloads from a workload list file.  See list_nodes help for details.
+  stop                Stop workloads from a workload list file. See list_nodes help for details.
+  restart             Restart workloads from a workload list file.  See list_nodes help for details.
+
+use 'nerve <command> --help' for more information about a command.
 """
 
-description = """
+
+# Help texts of arguments shared by several commands.
+HELP_VERBOSE = "Show debug information."
+HELP_YES = "Don't ask for confirmation."
+HELP_JSON_FILE = 'Filename or blank for "{}". The ".json" ending is automatically appended if not provided.'
+
+
+@functools.cache
+def _description() -> str:
+    """Returns the long description of the CLI, shown by --help."""
+    return """
 Nerve Management System CLI
 
 This is a command line interface for the Nerve Management System. It relies on files or environment variables to hold the credentials and a temporary file to hold the session information, as well as the workload list or node list. So the first thing you need to do is to set the login credentials with the set_login command, or set the environment variables using the shell script provided. For convinience, if you want to use different logins, you can use the set_login with a file name. 
@@ -67,7 +78,11 @@ Most filters support regex. In order to use regex, use "regex:" as a prefix to t
 Have fun!
 """
 
-node_list_description = """
+
+@functools.cache
+def _node_list_description() -> str:
+    """Returns the description of the list_nodes command, shown by list_nodes --help."""
+    return """
 List nodes filtered by the criteria and store it into a node list or print the result.\n
 
 When working on large systems, be aware that the command needs to anaylse every node which is not filtered out by the node filters. This can take a while if there are many nodes in the system. 
@@ -85,36 +100,91 @@ The commands reboot, start, stop and restart rely on a node list file. You can c
 When you create the file yourself, you can omit most information which is given in the node list file. You need to specify either the name or the serial number of a node to identify it. For a workload you either need the workload name, id or a version name.
  """
 
-def main():
-    """Main function to handle the command line interface."""
-    #
-    parser = argparse.ArgumentParser(description=description, prog="nerve", formatter_class=RawTextHelpFormatter)
-    subparsers = parser.add_subparsers(required=True, help='Available sub-commands:')
 
-    # Set login credentials
-    parser_set_login = subparsers.add_parser('set_login', 
+def _lazy(modname: str, funcname: str):
+    """Returns a handler which imports the module of the command only when the command is run.
+
+    Like this, an invocation only pays for importing the command that is actually used.
+    """
+    def runner(args):
+        return getattr(importlib.import_module(modname), funcname)(args)
+    return runner
+
+
+def json_filename(filename: str) -> str:
+    """Argument type for JSON files, the ".json" ending is appended if not provided."""
+    return append_ending(filename, ".json")
+
+
+def ini_filename(filename: str) -> str:
+    """Argument type for INI files, the ".ini" ending is appended if not provided."""
+    return append_ending(filename, ".ini")
+
+
+@functools.cache
+def _verbose_parent() -> argparse.ArgumentParser:
+    """Returns the parent parser holding the -V/--verbose flag, shared by the subparsers."""
+    parent = argparse.ArgumentParser(add_help=False)
+    parent.add_argument("-V", '--verbose', help=HELP_VERBOSE, action="store_true")
+    return parent
+
+
+@functools.cache
+def _yes_parent() -> argparse.ArgumentParser:
+    """Returns the parent parser holding the -y/--yes flag, shared by the subparsers."""
+    parent = argparse.ArgumentParser(add_help=False)
+    parent.add_argument("-y", '--yes', help=HELP_YES, action="store_true")
+    return parent
+
+
+def _parents(*, verbose=False, yes=False) -> list:
+    """Returns the parent parsers to pass to add_parser for the requested flags.
+
+    Parameters:
+    - verbose: If True, the -V/--verbose flag is included.
+    - yes: If True, the -y/--yes flag is included.
+    """
+    return ([_verbose_parent()] if verbose else []) + ([_yes_parent()] if yes else [])
+
+
+def _add_input_file(parser, default: str, flag: str = "-f"):
+    """Adds the --input_file argument, shared by the commands reading a node or workload list.
+
+    Parameters:
+    - parser: The parser of the command.
+    - default: Default name of the input file.
+    - flag: The short option of the argument.
+    """
+    parser.add_argument(flag, '--input_file', default=default, type=json_filename, help=HELP_JSON_FILE.format(default))
+
+
+def _build_set_login(subparsers):
+    """Adds the subparser of the set_login command."""
+    parser_set_login = subparsers.add_parser('set_login', parents=_parents(yes=True),
         help='Checks and sets login credentials. Uses file, enviroment vars or propmt.')
-    parser_set_login.add_argument("-f", "--file", default="credentials.ini", 
+    parser_set_login.add_argument("-f", "--file", default="credentials.ini", type=ini_filename, 
         help="Take the file and use it to get the credentials. '.ini' is automatically appended.")
     parser_set_login.add_argument("-u", '--url', 
         help='Enter the Nerve Management System URL. "https://" is added if the url does not start with "http".')
     parser_set_login.add_argument("-un",'--username', help='Enter your username.')
     parser_set_login.add_argument("-pw",'--password', help='Enter your password.')
-    parser_set_login.add_argument("-y",'--yes', help='Don\'t ask for confirmation.', action="store_true")
-    parser_set_login.set_defaults(func=handle_set_login)
+    parser_set_login.set_defaults(func=_lazy("commands.set_login", "handle_set_login"))
+
 
-    # Log out
+def _build_logout(subparsers):
+    """Adds the subparser of the logout command."""
     parser_logout = subparsers.add_parser('logout', help='Log out and delete session data.')
-    parser_logout.set_defaults(func=handle_logout)
+    parser_logout.set_defaults(func=_lazy("commands.logout", "handle_logout"))
 
-    # List workloads
+
+def _build_list_workloads(subparsers):
+    """Adds the subparser of the list_workloads command."""
     parser_workloads_list = subparsers.add_parser('list_workloads', help="List workloads and store them.", 
+                                                  parents=_parents(verbose=True),
                                                   description='List workloads with given filters. '+
                                                   'Store the result in a file or just print it as human readable text.')
     parser_workloads_list.add_argument("-t", '--type', 
                                        help='Exactly match type, typically docker|codesys|vm|docker-compose.')
-    parser_workloads_list.add_argument("-V", '--verbose', 
-                                       help='Show debug information.', action="store_true")
     parser_workloads_list.add_argument("-n", '--name', 
                                        help='Filter by name, supports regex.')
     parser_workloads_list.add_argument('--id', 
@@ -128,61 +198,73 @@ def main():
     parser_workloads_list.add_argument("-o",'--output', default="workloads.json", 
                                        help='Specify the output file name. Defaults to "workloads.json" if omitted.'+
                                         ' ".json" is appended if not included.')
-    parser_workloads_list.set_defaults(func=handle_workloads_list)
+    parser_workloads_list.set_defaults(func=_lazy("commands.list_workloads", "handle_workloads_list"))
+
 
-    # Create workload
-    parser_create_workload = subparsers.add_parser( 'create_workload', 
+def _build_create_workload(subparsers):
+    """Adds the subparser of the create_workload command."""
+    parser_create_workload = subparsers.add_parser( 'create_workload', parents=_parents(verbose=True),
                                             description="Create a new workload from the input (template) file given.", 
                                             help='Create a new workload.')
-    parser_create_workload.add_argument("-t",'--template', default="wl_def.json", 
+    parser_create_workload.add_argument("-t",'--template', default="wl_def.json", type=json_filename, 
                                         help='Template file name. Defaults to "wl.json" if omitted.')
     parser_create_workload.add_argument("-s",'--sequential', 
                                         help='Wait for completion of each download before starting a new one.', 
                                         action="store_true")
-    parser_create_workload.add_argument("-V", '--verbose', help='Show debug information.', action="store_true")
-    parser_create_workload.set_defaults(func=handle_create_workload)
+    parser_create_workload.set_defaults(func=_lazy("commands.create_workload", "handle_create_workload"))
+
 
-    # Create label
+def _build_create_label(subparsers):
+    """Adds the subparser of the create_label command."""
     parser_create_label = subparsers.add_parser('create_label', help='Create a new label.')
     parser_create_label.add_argument("-k",'--key', required=True, help='Enter the key.')
     parser_create_label.add_argument("-v", '--value', required=True, help='Enter the value.')
-    parser_create_label.set_defaults(func=handle_create_label)
+    parser_create_label.set_defaults(func=_lazy("commands.create_label", "handle_create_label"))
 
-    # Get label
+
+def _build_get_labels(subparsers):
+    """Adds the subparser of the get_labels command."""
     parser_create_label = subparsers.add_parser('get_labels', help='List the labels in the system.')
-    parser_create_label.set_defaults(func=handle_get_labels)
+    parser_create_label.set_defaults(func=_lazy("commands.get_labels", "handle_get_labels"))
+
 
+def _build_delete_label(subparsers):
+    """Adds the subparser of the delete_label command."""
     parser_delete_label = subparsers.add_parser('delete_label', help='Delete a label.')
-    parser_delete_label.add_argument("--id", help='Enter the label ID.')
-    parser_delete_label.set_defaults(func=handle_delete_label)
+    parser_delete_label.add_argument("--id", nargs="+", help='Enter the label ID. Several IDs can be given.')
+    parser_delete_label.set_defaults(func=_lazy("commands.delete_label", "handle_delete_label"))
 
+
+def _build_create_wl_template(subparsers):
+    """Adds the subparser of the create_wl_template command."""
     parser_create_workload_definition_template = subparsers.add_parser('create_wl_template', 
+            parents=_parents(verbose=True),
             description="Creates a workload defintion template from the first workload in the workload list.", 
             help="Creates a workload defintion template from the first workload in the workload list.")
     parser_create_workload_definition_template.add_argument("-i",'--input_file', default="workloads.json", 
-            help='Filename or blank for "workloads.json". The .json ending is automatically appended if not provided.')
+            type=json_filename,
+            help=HELP_JSON_FILE.format("workloads.json"))
     parser_create_workload_definition_template.add_argument("-o", '--output_file', default="wl_def.json", 
-            help='Filename or blank for "wl_def.json". The ".json" ending is automatically appended if not provided.')
-    parser_create_workload_definition_template.add_argument("-V", '--verbose', help='Show debug information.', 
-            action="store_true")
-    parser_create_workload_definition_template.set_defaults(func=handle_create_wl_template)
+            type=json_filename,
+            help=HELP_JSON_FILE.format("wl_def.json"))
+    parser_create_workload_definition_template.set_defaults(
+            func=_lazy("commands.create_wl_template", "handle_create_wl_template"))
 
-    # Delete workload
-    parser_delete_workload = subparsers.add_parser('delete_workloads', 
-            help='Delete workloads from a workload list file. Use list_workloads to create a list file.')
-    parser_delete_workload.add_argument("-i", '--input_file', default="workloads.json", 
-            help='Filename or blank for "workloads.json". The ".json" ending is appended if not provided.')
-    parser_delete_workload.add_argument("-V", '--verbose', help='Show debug information.', action="store_true")
-    parser_delete_workload.add_argument("-y",'--yes', help='Don\'t ask for confirmation.', action="store_true")
 
-    parser_delete_workload.set_defaults(func=handle_delete_workload)
+def _build_delete_workloads(subparsers):
+    """Adds the subparser of the delete_workloads command."""
+    parser_delete_workload = subparsers.add_parser('delete_workloads', parents=_parents(verbose=True, yes=True),
+            help='Delete workloads from a workload list file. Use list_workloads to create a list file.')
+    _add_input_file(parser_delete_workload, "workloads.json", "-i")
+    parser_delete_workload.set_defaults(func=_lazy("commands.delete_workload", "handle_delete_workload"))
 
-    # List Nodes
 
-    parser_list_nodes = subparsers.add_parser( 'list_nodes', 
+def _build_list_nodes(subparsers):
+    """Adds the subparser of the list_nodes command."""
+    parser_list_nodes = subparsers.add_parser( 'list_nodes', parents=_parents(verbose=True),
             help="List nodes and create a node list or add to the list. See the functions help for more information.", 
-            description=node_list_description, formatter_class=RawTextHelpFormatter)
-    parser_list_nodes.add_argument("-f", '--file_name', default="nodes.json", 
+            description=_node_list_description(), formatter_class=argparse.RawTextHelpFormatter)
+    parser_list_nodes.add_argument("-f", '--file_name', default="nodes.json", type=json_filename, 
             help="File containing the node list, 'nodes.json' if left unspecified. "+
              " '.json' is added automatically if not specified")
     parser_list_nodes.add_argument("-a", '--add', 
@@ -205,59 +287,126 @@ def main():
             help="Filter by workload status, supports regex. See above for possible values.")
     parser_list_nodes.add_argument("-wt",'--workload_type', 
             help='Filter by workload type, supports regex. Typically Docker|Codesys|VM|"Docker Compose"')
-    parser_list_nodes.add_argument("-V", '--verbose', help='Show debug information.', action="store_true")
+    parser_list_nodes.add_argument("-ct", '--cache_ttl', type=int, default=0,
+            help="Reuse the node list if it was fetched less than the given number of seconds ago. "+
+            "0 (default) always fetches it from the management system.")
     parser_list_nodes.add_argument("-H", '--human', 
             help='Print a listing instead of JSON. The resulting list is not written to a file.', action="store_true")
-    parser_list_nodes.set_defaults(func=handle_list_nodes)
+    parser_list_nodes.set_defaults(func=_lazy("commands.list_nodes", "handle_list_nodes"))
 
-    parser_reboot_nodes = subparsers.add_parser('reboot_nodes', 
+
+def _build_reboot_nodes(subparsers):
+    """Adds the subparser of the reboot_nodes command."""
+    parser_reboot_nodes = subparsers.add_parser('reboot_nodes', parents=_parents(verbose=True, yes=True),
             help="Reboot nodes from a node list file.  See list_nodes help for details.")
-    parser_reboot_nodes.add_argument("-f", '--input_file', default="nodes.json", 
-            help='Filename or blank for "nodes.json". The ".json" ending is automatically appended if not provided.')
-    parser_reboot_nodes.add_argument("-V", '--verbose', help='Show debug information.', action="store_true")
-    parser_reboot_nodes.add_argument("-y", '--yes', help='Don\'t ask for confirmation.', action="store_true")    
-    parser_reboot_nodes.set_defaults(func=handle_reboot_nodes)
+    _add_input_file(parser_reboot_nodes, "nodes.json")
+    parser_reboot_nodes.set_defaults(func=_lazy("commands.reboot_nodes", "handle_reboot_nodes"))
+
 
-    parser_start_workloads = subparsers.add_parser('start', 
+def _build_start(subparsers):
+    """Adds the subparser of the start command."""
+    parser_start_workloads = subparsers.add_parser('start', parents=_parents(verbose=True, yes=True),
             help="Start workloads from a workload list file.  See list_nodes help for details.")
-    parser_start_workloads.add_argument("-f", '--input_file', default="nodes.json", 
-            help='Filename or blank for "nodes.json". The ".json" ending is automatically appended if not provided.')
+    _add_input_file(parser_start_workloads, "nodes.json")
 #  parser_start_workloads.add_argument("-v", '--verify', help='Verify the workloads after the action. 
 #  Use with a time value in seconds, otherwise 15 seconds are assumed', nargs="?", type=int, const=15, 
 # default=argparse.SUPPRESS, action="store")
-    parser_start_workloads.add_argument("-V", '--verbose', help='Show debug information.', action="store_true")
-    parser_start_workloads.set_defaults(func=handle_start_workloads)
+    parser_start_workloads.set_defaults(func=_lazy("commands.control_workloads", "handle_start_workloads"))
 
-    parser_stop_workloads = subparsers.add_parser('stop', 
+
+def _build_stop(subparsers):
+    """Adds the subparser of the stop command."""
+    parser_stop_workloads = subparsers.add_parser('stop', parents=_parents(verbose=True, yes=True),
             help="Stop workloads from a workload list file. See list_nodes help for details.")
-    parser_stop_workloads.add_argument("-f", '--input_file', default="nodes.json", 
-            help='Filename or blank for "nodes.json". The ".json" ending is automatically appended if not provided.')
+    _add_input_file(parser_stop_workloads, "nodes.json")
     parser_stop_workloads.add_argument("-ff", '--force', help='Force stop the workloads.', action="store_true")
 #   parser_stop_workloads.add_argument('--verify', help='Verify the workloads after the action. Use with a time value
 #  in seconds, otherwise 15 seconds are assumed', nargs="?", type=int, const=15, default=argparse.SUPPRESS,
 #  action="store")
-    parser_stop_workloads.add_argument("-V", '--verbose', help='Show debug information.', action="store_true")
-    parser_stop_workloads.set_defaults(func=handle_stop_workloads)
+    parser_stop_workloads.set_defaults(func=_lazy("commands.control_workloads", "handle_stop_workloads"))
+
 
-    parser_restart_workloads = subparsers.add_parser('restart', 
+def _build_restart(subparsers):
+    """Adds the subparser of the restart command."""
+    parser_restart_workloads = subparsers.add_parser('restart', parents=_parents(verbose=True, yes=True),
             help="Restart workloads from a workload list file.  See list_nodes help for details.")
-    parser_restart_workloads.add_argument("-f", '--input_file', default="nodes.json", 
-            help='Filename or blank for "nodes.json". The ".json" ending is automatically appended if not provided.')
+    _add_input_file(parser_restart_workloads, "nodes.json")
 # parser_restart_workloads.add_argument("-v",'--verify', help='Verify the workloads after the action. 
 # Use with a time value in seconds, otherwise 15 seconds are assumed', nargs="?", type=int, const=15, default=argparse.
 # SUPPRESS, action="store")
-    parser_restart_workloads.add_argument("-V", '--verbose', help='Show debug information.', action="store_true")
-    parser_restart_workloads.set_defaults(func=handle_restart_workloads)
-
+    parser_restart_workloads.set_defaults(func=_lazy("commands.control_workloads", "handle_restart_workloads"))
+
+
+# Handlers of commands without arguments. When called without any further argument, they are run without building the
+# parser at all.
+_FAST_PATHS = {
+    "logout": _lazy("commands.logout", "handle_logout"),
+    "get_labels": _lazy("commands.get_labels", "handle_get_labels"),
+}
+
+
+# Functions adding the subparser of each command, in the order in which the commands are listed in the help.
+BUILDERS = {
+    "set_login": _build_set_login,
+    "logout": _build_logout,
+    "list_workloads": _build_list_workloads,
+    "create_workload": _build_create_workload,
+    "create_label": _build_create_label,
+    "get_labels": _build_get_labels,
+    "delete_label": _build_delete_label,
+    "create_wl_template": _build_create_wl_template,
+    "delete_workloads": _build_delete_workloads,
+    "list_nodes": _build_list_nodes,
+    "reboot_nodes": _build_reboot_nodes,
+    "start": _build_start,
+    "stop": _build_stop,
+    "restart": _build_restart,
+}
+
+
+def main(argv=None):
+    """Main function to handle the command line interface.
+
+    Parameters:
+    - argv: The command line arguments without the program name. If None, sys.argv is used.
+
+    Returns:
+    The exit code of the command.
+    """
+    #
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # Show the general help without building the parser, it is static anyway.
+    if not argv:
+        print(help_text, file=sys.stderr)
+        return 1
+    if argv[0] in ("-h", "--help", "help"):
+        print(_description() + help_text)
+        return 0
+    if len(argv) == 1 and argv[0] in _FAST_PATHS:
+        return _FAST_PATHS[argv[0]](argparse.Namespace())
+
+    parser = argparse.ArgumentParser(description=_description(), prog="nerve",
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    subparsers = parser.add_subparsers(required=True, help='Available sub-commands:')
 
-    if len(sys.argv)==1:
-        parser.print_help(sys.stderr)
-        sys.exit(1)
+    # Only the subparser of the requested command is built. If the command can not be determined (e.g. for --help or
+    # a typo), all of them are built so argparse can list the commands.
+    command = next((arg for arg in argv if not arg.startswith("-")), None)
+    if command in BUILDERS:
+        BUILDERS[command](subparsers)
+    else:
+        for build in BUILDERS.values():
+            build(subparsers)
 
-    args = parser.parse_args()
-    args.func(args)
+    args = parser.parse_args(argv)
+    return args.func(args)
 
 
-    
 if __name__ == "__main__":
-    main()
+    exit_code = main()
+    # All files are closed by the handlers, so the interpreter teardown can be skipped after flushing the output.
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(exit_code)
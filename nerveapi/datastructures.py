@@ -30,10 +30,11 @@ from nerveapi.utils import DataNotAsExpected
 # Data structures for the Nerve API
 # The _definition classes hold all possible information that need to be sent to the MS for creating a new object.
 # The dataclasses could be avoided alltogehter, but then it would be less clear which data needs to be stored.
+# All of them use slots to keep instances small. The leaf records are also frozen, and therefore hashable.
 
 # Workload
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PortMappingsProtocol:
     """Port definition."""
     container_port: int
@@ -41,34 +42,34 @@ class PortMappingsProtocol:
     protocol: str
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Selector:
     """Selector definition."""
     key: str
     value: str
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class User_and_Date:
     """User and date definition."""
     user: str
     date: str
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class LimitMemory:
     """Memory limit definition."""
     unit: str  # one of "GB", "MB"
     value: float
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Date_only:
     """Date definition."""
     date: str
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Volume:
     """Volume definition."""
     volumeName: str
@@ -76,14 +77,14 @@ class Volume:
     configurationStorage: bool
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class EnvironmentVariable:
     """Environment variable definition."""
     env_variable: str
     container_value: str
 
 
-@dataclass
+@dataclass(slots=True)
 class RemoteConnection_Definition:
     """Remote connection definition."""
     acknowledgment: str
@@ -94,31 +95,31 @@ class RemoteConnection_Definition:
     type: str
 
 
-@dataclass
+@dataclass(slots=True)
 class Template:
     """Template definition."""
     values: List[str] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
 class UploadFile:
     """Upload file definition."""
     file_name: str
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AuthCrendentials:
     """Auth credentials definition."""
     username: str
     password: str
 
-@dataclass
+@dataclass(slots=True)
 class DockerRepoPath:
     """Docker repo path definition."""
     path: str
     auth_credentials: Optional[AuthCrendentials] = None
 
-@dataclass
+@dataclass(slots=True)
 class WorkloadVersion_Docker_Properties_Definition:
     """Workload version docker properties definition."""
     # port_mappsing_protocol
@@ -132,7 +133,7 @@ class WorkloadVersion_Docker_Properties_Definition:
     port_mappings_protocol: List[PortMappingsProtocol]
 
 
-@dataclass
+@dataclass(slots=True)
 class WorkloadVersion_Docker_Definition:
     """Workload version docker definition."""
     name: str
@@ -145,7 +146,7 @@ class WorkloadVersion_Docker_Definition:
     source: Union[UploadFile, DockerRepoPath]
 
 
-@dataclass
+@dataclass(slots=True)
 class Workload_Definition:
     """Workload definition."""
     type: str
@@ -230,11 +231,14 @@ def create_workload_version_definition_from_json(item, type):
     if len(selectors) > 0:
         print("Selectors are not supported yet. Omitting.")
 
-    lm_def = item.get("workloadProperties").get("limit_memory", None)
+    # Looked up once, all the properties below are read from it.
+    wp = item.get("workloadProperties") or {}
+
+    lm_def = wp.get("limit_memory", None)
     limit_memory = LimitMemory(** lm_def) if lm_def else None
 
-    pmp_def = item.get("workloadProperties").get("port_mappings_protocol", [])
-    pmp = [PortMappingsProtocol(**item) for item in pmp_def]
+    pmp_def = wp.get("port_mappings_protocol", [])
+    pmp = [PortMappingsProtocol(**mapping) for mapping in pmp_def]
 
     if type == "docker":
         return WorkloadVersion_Docker_Definition(
@@ -247,17 +251,14 @@ def create_workload_version_definition_from_json(item, type):
             name=item.get("name"),
             workloadProperties=WorkloadVersion_Docker_Properties_Definition(
                 environment_variables=[EnvironmentVariable(
-                    **item) for item in item.get("workloadProperties").get("environment_variables", [])],
+                    **variable) for variable in wp.get("environment_variables", [])],
                 limit_memory=limit_memory,
-                container_name=item.get(
-                    "workloadProperties").get("container_name"),
-                limit_CPUs=item.get("workloadProperties").get(
-                    "limit_CPUs", None),
-                restart_policy=item.get("workloadProperties").get(
-                    "restart_policy", ""),
+                container_name=wp.get("container_name"),
+                limit_CPUs=wp.get("limit_CPUs", None),
+                restart_policy=wp.get("restart_policy", ""),
                 docker_volumes=[Volume(
-                    **item) for item in item.get("workloadProperties").get("docker_volumes", [])],
-                networks=item.get("workloadProperties").get("networks", []),
+                    **volume) for volume in wp.get("docker_volumes", [])],
+                networks=wp.get("networks", []),
                 port_mappings_protocol=pmp,
             ),
             #                    dockerFilePath= item.get("dockerFilePath"),
@@ -274,15 +275,11 @@ def create_workload_definition_from_json(json_data):
     """Creates a Workload_Definition from the JSON returned by the Nerve API."""
     if not json_data:
         return None
-    versions = []
     type = json_data.get("type")
-    if type == "docker":
-        for item in json_data.get("versions"):
-            versions.append(
-                create_workload_version_definition_from_json(item, type))
-    else:
+    if type != "docker":
         raise DataNotAsExpected(f"Type {type} not supported yet.")
-    
+    versions = [create_workload_version_definition_from_json(item, type) for item in json_data.get("versions")]
+
     return Workload_Definition(
         type=type,
         name=json_data.get("name"),
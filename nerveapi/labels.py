@@ -18,12 +18,15 @@
 # TTTech Industrial Automation AG, Schoenbrunnerstrasse 7, 1040 Vienna, Austria
 """Handling of labels."""
 
-from .session import make_request
+from concurrent.futures import ThreadPoolExecutor
+
+from .session import make_request, MAX_PARALLEL_REQUESTS
 from .utils import (
     complainIfNotAList,
     complainIfKeysAreNotInDict,
     ActionUnsuccessful,
-    serverMessage
+    serverMessage,
+    parse_json
 )
 from json import JSONDecodeError
 
@@ -57,7 +60,7 @@ def get_labels():
     """Returns a dictionary of labels, where the id is the key and the value is a tuple (key,value)."""
     result = make_request("/nerve/labels/list")
     try:
-        data = result.json()
+        data = parse_json(result.content)
     except JSONDecodeError:
         raise ActionUnsuccessful("Could not decode JSON response.")
     complainIfKeysAreNotInDict(data, ["count", "data"])
@@ -83,4 +86,30 @@ def delete_label(_id: str):
     if not response:
         raise ActionUnsuccessful(serverMessage(response))
     # Check the response and print the outcome.
-    return
\ No newline at end of file
+    return
+
+
+def delete_labels(ids: list[str], max_workers: int = MAX_PARALLEL_REQUESTS) -> list:
+    """Deletes several labels concurrently.
+
+    A failure does not stop the deletion of the other labels.
+
+    Parameters:
+    - ids: The ids of the labels to delete.
+    - max_workers: The maximum number of requests sent at the same time.
+
+    Returns:
+    A list with one entry per id, in the same order: None if the label was deleted, otherwise the
+    ActionUnsuccessful exception describing the failure.
+    """
+    def try_delete(_id):
+        try:
+            delete_label(_id)
+        except ActionUnsuccessful as e:
+            return e
+        return None
+
+    if not ids:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ids))) as executor:
+        return list(executor.map(try_delete, ids))
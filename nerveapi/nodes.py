@@ -25,15 +25,19 @@ from .utils import (
     complainIfKeysAreNotInDict,
     complainIfNotAList,
     create_regex,
-    findDictByValue
+    parse_json,
+    plural,
+    build_index
 )
 
 
+import re
 from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 
-from .session import make_request
+from .session import make_request, MAX_PARALLEL_REQUESTS
 from pprint import pprint
-import json
 
 
 def create_node_list(verbose=False, ms_labels=None):
@@ -72,38 +76,34 @@ def filter_node_list(
     """
     #
 
-    name_pattern = create_regex(name_filter)
-    path_pattern = create_regex(path_filter)
-    node_version_pattern = create_regex(node_version_filter)
-    label_pattern = create_regex(label_filter)
-    model_pattern = create_regex(model_filter)
+    # The patterns are compiled once per call, and only for the filters which are set. An unset filter matches
+    # anything, so there is nothing to check for it.
+    # The bound match methods are kept in locals, so they don't have to be looked up again for every node.
+    field_checks = [(create_regex(pattern).match, key) for pattern, key in (
+        (name_filter, 'name'),
+        (node_version_filter, 'version'),
+        (model_filter, 'model')) if pattern is not None]
+    path_match = create_regex(path_filter).match if path_filter is not None else None
+    label_match = create_regex(label_filter).match if label_filter else None
+
+    if not field_checks and not path_match and not label_match:
+        return list(node_list)
 
     filtered_nodes = []
+    append = filtered_nodes.append
 
     for node in node_list:
-        path_string = "/".join(node['path'])
-        labels = node['labels']
-
-        # If there is no label filter, we don't need to check for label matches
-        if label_filter:
-            labels_matches = False
-            for label in labels:
-                label_string = ":".join(label)
-                if label_pattern.match(label_string):
-                    labels_matches = True
-                    break
-            if not labels_matches:
-                continue
-
-        if not name_pattern.match(node['name']):
-            continue
-        if not path_pattern.match(path_string):
+        if not all(match(node[key]) for match, key in field_checks):
             continue
-        if not node_version_pattern.match(node['version']):
+
+        # The path and the labels are only joined if they are filtered for.
+        if path_match and not path_match("/".join(node['path'])):
             continue
-        if not model_pattern.match(node['model']):
+
+        if label_match and not any(label_match(":".join(label)) for label in node['labels']):
             continue
-        filtered_nodes.append(node)
+
+        append(node)
     return filtered_nodes
 
 
@@ -132,39 +132,42 @@ def filter_node_list_for_wl(
 
     Returns:
     - List[dict]: A list of nodes, where each node contains only the workloads
-                  that match the specified filters. The data of each node in the list
-                  is preserved, but the 'workloads' key of each node will only include the
-                  filtered workloads.
+                  that match the specified filters. The nodes are shallow copies with the
+                  data of the input nodes, but the 'workloads' key of each node will only
+                  include the filtered workloads. The input list is not modified.
     """    
     #
-    name_pattern = create_regex(name_filter)
-    _id_pattern = create_regex(_id_filter)
-    version_name_pattern = create_regex(version_name_filter)
-    version_id_pattern = create_regex(version_id_filter)
-    status_pattern = create_regex(status_filter)
-    type_pattern = create_regex(type_filter)
+    # The patterns are compiled once per call, and only for the filters which are set.
+    # IDs are ASCII only, so their patterns can use the faster ASCII matching.
+    checks = [(create_regex(pattern, flags=flags).match, key) for pattern, key, flags in (
+        (name_filter, 'name', 0),
+        (_id_filter, '_id', re.ASCII),
+        (version_name_filter, 'version_name', 0),
+        (version_id_filter, 'version_id', re.ASCII),
+        (status_filter, 'state', 0),
+        (type_filter, 'type', 0)) if pattern is not None]
+
+    if not checks:
+        # Without filters every workload matches, only nodes without workloads are dropped.
+        return [node for node in node_list if node['workloads']]
+
+    if len(checks) == 1:
+        # The common case of a single filter does without the generator of all().
+        [(match, key)] = checks
+
+        def is_selected(wl):
+            return match(wl[key])
+    else:
+        def is_selected(wl):
+            return all(match(wl[key]) for match, key in checks)
 
     filtered_nodes = []
+    append = filtered_nodes.append
     for node in node_list:
-        wl_list = []
-
-        for wl in node['workloads']:
-            if not name_pattern.match(wl['name']):
-                continue
-            if not _id_pattern.match(wl['_id']):
-                continue
-            if not version_name_pattern.match(wl['version_name']):
-                continue
-            if not version_id_pattern.match(wl['version_id']):
-                continue
-            if not status_pattern.match(wl['state']):
-                continue
-            if not type_pattern.match(wl['type']):
-                continue
-            wl_list.append(wl)
-        if len(wl_list) > 0:
-            node['workloads'] = wl_list
-            filtered_nodes.append(node)
+        wl_list = [wl for wl in node['workloads'] if is_selected(wl)]
+        if wl_list:
+            # The node is copied, the caller's node list stays untouched.
+            append({**node, 'workloads': wl_list})
     return filtered_nodes
 
 
@@ -191,7 +194,7 @@ def get_deployed_workloads_from_node(serialNumber):
         error_msg = serverMessage(response)
         raise ActionUnsuccessful(error_msg)
 
-    data = response.json()
+    data = parse_json(response.content)
     wl_list = []
     for wl in data:
         complainIfKeysAreNotInDict(
@@ -211,7 +214,7 @@ def get_deployed_workloads_from_node(serialNumber):
 
         complainIfKeysAreNotInDict(property, ["value"])
         value_as_string = property.get("value")
-        value = json.loads(value_as_string)
+        value = parse_json(value_as_string)
 
         complainIfKeysAreNotInDict(
             value, ["workloadId", "versionId", "workloadVersionName"])
@@ -247,6 +250,28 @@ def get_deployed_workloads_from_node(serialNumber):
     return wl_list
 
 
+def get_deployed_workloads_from_nodes(serial_numbers: List[str]) -> List[list]:
+    """Retrieves the deployed workloads of several nodes concurrently.
+
+    The requests are independent of each other and are therefore sent in parallel.
+    See get_deployed_workloads_from_node for details.
+
+    Parameters:
+    - serial_numbers (List[str]): The serial numbers of the nodes.
+
+    Returns:
+    - List[list]: The lists of deployed workloads, in the same order as the serial numbers.
+
+    Raises:
+    - ActionUnsuccessful: If the workloads of any of the nodes could not be retrieved.
+    """
+    #
+    if not serial_numbers:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_REQUESTS, len(serial_numbers))) as executor:
+        return list(executor.map(get_deployed_workloads_from_node, serial_numbers))
+
+
 def create_node_list_and_tree(verbose=False, ms_labels=None):
     """Creates both a hierarchical tree structure and a flat list of all nodes retrieved from the management system.
 
@@ -280,13 +305,14 @@ def create_node_list_and_tree(verbose=False, ms_labels=None):
         print(f"Action unsuccessful: {error_msg}")
         raise ActionUnsuccessful(error_msg)
 
-    data = response.json()[0]
+    data = parse_json(response.content)[0]
     complainIfKeysAreNotInDict(data, ["_id", "name", "type"])
 
     if verbose:
         pprint("Reading node tree root.")
-    [children, node_list] = get_children_of(data['_id'], type=data['type'], path=[
-                                            'root'], verbose=verbose, ms_labels=ms_labels)
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as executor:
+        [children, node_list] = get_children_of(data['_id'], type=data['type'], path=(
+                                                'root',), verbose=verbose, ms_labels=ms_labels, executor=executor)
 
     tree = {
         '_id': data.get('_id'),
@@ -298,22 +324,8 @@ def create_node_list_and_tree(verbose=False, ms_labels=None):
     return [tree, node_list]
 
 
-def get_children_of(_id, type, path=[], verbose=False, ms_labels=None):
-    """This function retrieves the children of a node in the node tree recursively.
-
-    Recursion stops when a node is a leaf node (type 'node').
-    The function returns a list of children and a list of nodes, with the 
-    node details fileed in.
-
-    Parameters:
-    - _id (str): The ID of the node whose children are to be retrieved.
-    - type (str): The type of the node. Must be 'folder', 'root', or 'unassigned'.
-    - path (list, optional): The path to the current node in the tree
-    - verbose (bool, optional): If True, prints additional information about the progress of the function.
-    - ms_labels (dict, optional): The labels information to be able to insert the data in clear text, not as ID.
-    """
-    node_list = []
-
+def _get_children_data(_id, type):
+    """Retrieves the raw list of children of a single node tree item from the management system."""
     if type == 'folder' or type == 'root':
         response = make_request(f"/nerve/tree-node/parent/{_id}")
     elif type == 'unassigned':
@@ -325,65 +337,104 @@ def get_children_of(_id, type, path=[], verbose=False, ms_labels=None):
         error_msg = "Server did not return a valid response"  # Adjusted for example
         raise Exception("ActionUnsuccessful", error_msg)
 
-    data = response.json()  # we expect this to be a list of children
+    return parse_json(response.content)  # we expect this to be a list of children
 
-    children = []
-    for child in data:
-        complainIfKeysAreNotInDict(child, ["_id", "name", "type"])
 
-        # Building the path for the current child
-        current_path = path[:]  # Clone the current path
-        current_path.append(child["name"])
+def get_children_of(_id, type, path=(), verbose=False, ms_labels=None, executor=None):
+    """This function retrieves the children of a node in the node tree recursively.
 
-        child_dict = {
-            '_id': child['_id'],
-            'name': child['name'],
-            'type': child['type'],
-            'path': current_path  # Include the path in the structure
-        }
+    Recursion stops when a node is a leaf node (type 'node').
+    The function returns a list of children and a list of nodes, with the 
+    node details fileed in.
 
-        if child['type'] == 'folder' or child['type'] == 'unassigned':
-            if verbose:
-                print("Getting data of node tree item:", child_dict['name'])
-            [child_dict["children"], nodes] = get_children_of(
-                child_dict['_id'], type=child_dict['type'], path=current_path, ms_labels=ms_labels)
-            node_list.extend(nodes)
-
-        children.append(child_dict)
-
-        if child['type'] == "node":
-            device = child['device']
-            serialNumber = device['serialNumber']
-            label_ids = device['labels']
-            device_labels = []
-            if ms_labels is not None:
-                device_labels = create_device_label_list(label_ids, ms_labels)
-            node_list.append(
-                {
-                    '_id':   child_dict['_id'],
-                    'name':  child_dict['name'],
-                    'serial_number': serialNumber,
-                    'connection_status': device['connectionStatus'],
-                    'version': device['currentFWVersion'],
-                    'model': device['model'],
-                    'labels': device_labels,
-                    # remove the name of the node from the path
-                    'path':  child_dict['path'][:-1]
+    The tree is traversed level by level. The children of all folders of one level are requested
+    in parallel, the node list is still returned in depth-first order.
+
+    Parameters:
+    - _id (str): The ID of the node whose children are to be retrieved.
+    - type (str): The type of the node. Must be 'folder', 'root', or 'unassigned'.
+    - path (tuple, optional): The path to the current node in the tree
+    - verbose (bool, optional): If True, prints additional information about the progress of the function.
+    - ms_labels (dict, optional): The labels information to be able to insert the data in clear text, not as ID.
+    - executor (ThreadPoolExecutor, optional): The executor used for the requests. A new one is created if not given.
+    """
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as executor:
+            return get_children_of(_id, type, path, verbose, ms_labels, executor)
+
+    top = {'_id': _id, 'type': type, 'path': tuple(path)}
+    # The node records of the children of each tree item, keyed by the id of the child.
+    records = {}
+    level = [top]
+    while level:
+        next_level = []
+        for item, data in zip(level, executor.map(lambda item: _get_children_data(item['_id'], item['type']), level)):
+            children = []
+            for child in data:
+                complainIfKeysAreNotInDict(child, ["_id", "name", "type"])
+
+                # Building the path for the current child. Paths are tuples, so they can be shared safely.
+                current_path = item['path'] + (child["name"],)
+
+                child_dict = {
+                    '_id': child['_id'],
+                    'name': child['name'],
+                    'type': child['type'],
+                    'path': current_path  # Include the path in the structure
                 }
-            )
-    return [children, node_list]
+
+                if child['type'] == 'folder' or child['type'] == 'unassigned':
+                    if verbose:
+                        print("Getting data of node tree item:", child_dict['name'])
+                    next_level.append(child_dict)
+
+                children.append(child_dict)
+
+                if child['type'] == "node":
+                    device = child['device']
+                    label_ids = device['labels']
+                    device_labels = []
+                    if ms_labels is not None:
+                        device_labels = create_device_label_list(label_ids, ms_labels)
+                    records[child['_id']] = {
+                        '_id':   child_dict['_id'],
+                        'name':  child_dict['name'],
+                        'serial_number': device['serialNumber'],
+                        'connection_status': device['connectionStatus'],
+                        'version': device['currentFWVersion'],
+                        'model': device['model'],
+                        'labels': device_labels,
+                        # the path of the parent is the path of the node without its name
+                        'path':  item['path']
+                    }
+            item['children'] = children
+        level = next_level
+
+    # Collect the nodes in the same depth-first order as the tree.
+    node_list = []
+    stack = [iter(top['children'])]
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+        elif 'children' in child:
+            stack.append(iter(child['children']))
+        elif child['_id'] in records:
+            node_list.append(records[child['_id']])
+    return [top['children'], node_list]
 
 
 def create_device_label_list(ids: list[str], ms_labels: dict[str, dict[str, str]]) -> list[dict[str, str]]:
     """Creates a nice list of dictionary of labels for a device from the IDs of the labels and the label list."""
-    node_labels = []
-    for id in ids:
-        if id in ids:
-            node_labels.append(ms_labels.get(id))
-        else:
-            raise DataNotAsExpected(
-                f"Label with id {id} not found in the label list.")
-    return node_labels
+    if not ids:
+        return []
+    # itemgetter fetches all labels in one call. With a single ID it returns the label instead of a tuple.
+    try:
+        labels = itemgetter(*ids)(ms_labels)
+    except KeyError as e:
+        raise DataNotAsExpected(
+            f"Label with id {e.args[0]} not found in the label list.") from None
+    return list(labels) if len(ids) > 1 else [labels]
 
 
 def reboot_node(serial_number: str):
@@ -410,7 +461,8 @@ def reboot_node(serial_number: str):
 # The order of precedence is: serial_number, _id, name
 
 
-def create_node_list_from_node_list(partial_list: List[dict], with_workloads=False, verbose = False) -> List[dict]:
+def create_node_list_from_node_list(partial_list: List[dict], with_workloads=False, verbose = False,
+                                    workload_cache: Optional[dict] = None) -> List[dict]:
     """Creates a list of nodes with all information filled from a partial list of nodes.
 
     It uses the serial number, or name to find the node. This way the provider of the input list
@@ -420,25 +472,31 @@ def create_node_list_from_node_list(partial_list: List[dict], with_workloads=Fal
     parameters:
     - partial_list (List[dict]): A list of dictionaries representing nodes with partial information.
     - with_workloads (bool, optional): If True, retrieves the workloads of the nodes as well.
+    - workload_cache (dict, optional): The deployed workloads by serial number. Nodes which appear more than
+      once in the partial list are only asked once. A new cache is used for each call if not given.
     """
     #
     [node_tree, node_list] = create_node_list_and_tree(verbose)
+    if workload_cache is None:
+        workload_cache = {}
 
     complainIfNotAList(partial_list)
 
-    result_list = []
+    by_serial_number = build_index(node_list, 'serial_number')
+    by_name = build_index(node_list, 'name')
+
+    found_nodes = []
 
     for node in partial_list:
         found_node = None        
         if node.get('serial_number'):
             if verbose:
                 print("Searching for node with serial number", node['serial_number'])
-            found_node = findDictByValue(
-                node_list, 'serial_number', node['serial_number'])
+            found_node = by_serial_number.get(node['serial_number'])
         elif node.get('name'):
             if verbose:
                 print("Searching for node with name", node['name'])
-            found_node = findDictByValue(node_list, 'name', node['name'])
+            found_node = by_name.get(node['name'])
         else:
             if verbose:
                 print("No info to identify node found! I need at either serial_number or name.")
@@ -447,26 +505,41 @@ def create_node_list_from_node_list(partial_list: List[dict], with_workloads=Fal
         if found_node:
             if verbose:
                 print("Found node:", found_node['name'])
-
-            if with_workloads and node.get('workloads'):
-                found_node['workloads'] = create_wl_list_from_wl_list(
-                    node['workloads'], found_node, verbose)
-            else:
-                if verbose:
-                    print("No workloads to add!")
-                found_node['workloads'] = []
-    
-            result_list.append(found_node)
+            found_nodes.append((node, found_node))
         else:
             if verbose:
                 print("Node not found!")    
 
+    if with_workloads:
+        # The workloads of all online nodes are requested in parallel up front, the matching below is then
+        # served from the cache.
+        serial_numbers = list(dict.fromkeys(
+            found_node['serial_number'] for node, found_node in found_nodes
+            if node.get('workloads') and found_node["connection_status"] == "online"
+            and found_node['serial_number'] not in workload_cache))
+        if verbose and serial_numbers:
+            print(f"Getting workloads of {len(serial_numbers)} node{plural(len(serial_numbers))}.")
+        workload_cache.update(zip(serial_numbers, get_deployed_workloads_from_nodes(serial_numbers)))
+
+    # Each entry gets its own copy of the node. A node listed more than once would otherwise be the same
+    # dictionary, and only the workloads of its last entry would remain.
+    result_list = []
+    for node, found_node in found_nodes:
+        if with_workloads and node.get('workloads'):
+            workloads = create_wl_list_from_wl_list(node['workloads'], found_node, verbose, workload_cache)
+        else:
+            if verbose:
+                print("No workloads to add!")
+            workloads = []
+
+        result_list.append({**found_node, 'workloads': workloads})
+
     return result_list
 
 # ensures that the device_id is present in the workloads of the nodes
 # uses name or version_name to find the workload in the complete list
 
-def create_wl_list_from_wl_list(partial_list, node, verbose=False):
+def create_wl_list_from_wl_list(partial_list, node, verbose=False, workload_cache=None):
     """Creates a list with all information filled from a partial list of workloads.
 
     It uses the device_id, name, or version_name to find the workload. This way the provider of the input list
@@ -475,13 +548,20 @@ def create_wl_list_from_wl_list(partial_list, node, verbose=False):
     parameters:
     - partial_list (List[dict]): A list of dictionaries representing workloads with partial information.
     - node: The node information where the workloads are deployed.
+    - workload_cache (dict, optional): The deployed workloads by serial number, filled on first access.
     """
     #
     if (node["connection_status"] == "online"):
-        if verbose:
-            print("Getting workloads for node",
-                    node["name"])
-        complete_list = get_deployed_workloads_from_node(node["serial_number"])
+        serial_number = node["serial_number"]
+        if workload_cache is not None and serial_number in workload_cache:
+            complete_list = workload_cache[serial_number]
+        else:
+            if verbose:
+                print("Getting workloads for node",
+                        node["name"])
+            complete_list = get_deployed_workloads_from_node(serial_number)
+            if workload_cache is not None:
+                workload_cache[serial_number] = complete_list
     else:
         if verbose:
             print("Node is offline. No workloads to get.")
@@ -492,23 +572,25 @@ def create_wl_list_from_wl_list(partial_list, node, verbose=False):
             print("No workloads found for node.")
         return []
 
+    by_device_id = build_index(complete_list, 'device_id')
+    by_name = build_index(complete_list, 'name')
+    by_version_name = build_index(complete_list, 'version_name')
+
     result = []
     for wl in partial_list:
         found_wl = None
         if wl.get('device_id'):
             if verbose:
                 print("Searching for workload with device_id", wl['device_id'])
-            found_wl = findDictByValue(
-                complete_list, 'device_id', wl['device_id'])
+            found_wl = by_device_id.get(wl['device_id'])
         elif wl.get('name'):
             if verbose:
                 print("Searching for workload with name", wl['name'])
-            found_wl = findDictByValue(complete_list, 'name', wl['name'])
+            found_wl = by_name.get(wl['name'])
         elif wl.get('version_name'):
             if verbose:
                 print("Searching for workload with version_name", wl['version_name'])
-            found_wl = findDictByValue(
-                complete_list, 'version_name', wl['version_name'])
+            found_wl = by_version_name.get(wl['version_name'])
         else:
             if verbose:
                 print("No info to identify workload found! I need device_id, name or version_name.")
@@ -523,19 +605,21 @@ def create_wl_list_from_wl_list(partial_list, node, verbose=False):
 
 def all_nodes_have_serial_numbers(node_list: List[dict]):
     """Checks if all nodes within a node list have serial numbers."""
-    for node in node_list:
-        if not node.get('serial_number'):
-            return False
-    return True
+    return all(node.get('serial_number') for node in node_list)
 
 
 def all_workloads_have_device_ids(node_list: List[dict]):
     """Checks if all workloads within a node list have device IDs."""
-    for node in node_list:
-        for wl in node["workloads"]:
-            if not wl.get('device_id'):
-                return False
-    return True
+    return all(wl.get('device_id') for node in node_list for wl in node["workloads"])
+
+
+# The command sent to the management system and its forceStop flag for each action of control_workload.
+_ACTION_TEMPLATES = {
+    "start": ("START", False),
+    "stop": ("STOP", False),
+    "restart": ("RESTART", False),
+    "force_stop": ("STOP", True),
+}
 
 
 def control_workload(action, serial_number, device_id):
@@ -551,19 +635,14 @@ def control_workload(action, serial_number, device_id):
     - ActionUnsuccessful: If the request to the management system fails.
     """
     #
-    if action not in ["start", "stop", "restart", "force_stop"]:
+    try:
+        command, force_stop = _ACTION_TEMPLATES[action]
+    except KeyError:
         raise ValueError(
-            "Action must be 'start', 'stop', 'force_stop', or 'restart'")
-
-    force_stop = False
-    if action == "force_stop":
-        action = "STOP"
-        force_stop = True
-
-    action = action.upper()
+            "Action must be 'start', 'stop', 'force_stop', or 'restart'") from None
 
     data = {
-        "command": action,
+        "command": command,
         "deviceId": device_id,
         "forceStop": force_stop,
         "serialNumber": serial_number,
@@ -574,5 +653,5 @@ def control_workload(action, serial_number, device_id):
                             method='POST', workaround="Inject_Session_Token_To_Controller_Call")
     if not response:
         error_msg = serverMessage(response)
-        raise ActionUnsuccessful(f"Error trying to initialize '{action}' on workload {device_id} on node {serial_number} server returned: {error_msg}")
+        raise ActionUnsuccessful(f"Error trying to initialize '{command}' on workload {device_id} on node {serial_number} server returned: {error_msg}")
     return
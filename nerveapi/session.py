@@ -18,19 +18,43 @@
 # TTTech Industrial Automation AG, Schoenbrunnerstrasse 7, 1040 Vienna, Austria
 """Session handling."""
 
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from nerveapi.utils import (
     load_session_id, 
     save_session_id, 
     complainIfKeysAreNotInDict,
     complainIfNotAList, 
     serverMessage,
+    encode_json,
     ActionUnsuccessful
 )
-import json
-from requests_toolbelt.multipart.encoder import MultipartEncoder
 
 
+# All requests go through one session, so connections to the MS are kept alive and reused instead of doing a new
+# TCP/TLS handshake for every call.
+# Failed connection attempts and dropped idle connections are retried a few times with a short backoff. urllib3 only
+# resends requests which can be repeated safely, a POST that reached the MS is not sent twice.
+_RETRY = Retry(total=3, backoff_factor=0.2)
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=_RETRY))
+_session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=_RETRY))
+
+# Headers which are the same for every request. They are set on the session once, make_request only adds the
+# session ID and the content type.
+_BASE_HEADERS = {
+    'Sec-Fetch-Dest': 'empty',
+    'Sec-Fetch-Mode': 'cors',
+    'Sec-Fetch-Site': 'same-origin'
+}
+_session.headers.update(_BASE_HEADERS)
+
+# Upper bound for requests that are sent concurrently, kept below the pool size of the session.
+MAX_PARALLEL_REQUESTS = 16
+
 
 def login(base_url, identity, secret):
     """Attempt to log in to the Nerve management system.
@@ -48,7 +72,7 @@ def login(base_url, identity, secret):
     payload = {'identity': identity, 'secret': secret}
 
     try:
-        response = requests.post(login_url, json=payload)
+        response = _session.post(login_url, json=payload)
     except requests.exceptions.MissingSchema:
         raise ActionUnsuccessful(
             "Invalid URL provided. URLs must start with http:// or https://.") from None
@@ -88,7 +112,23 @@ def logout():
     save_session_id('', '')
 
 
-def make_request(endpoint, method='GET', data=None, files=None, workaround=None):
+# Responses of GET requests which were made with a cache_ttl, by URL and query parameters. Any other request clears
+# the cache, since it may change what the GET requests return.
+_response_cache = {}
+_response_cache_lock = threading.Lock()
+# Counts the clears of the cache. A GET which was sent before a clear must not store its possibly stale response.
+_response_cache_generation = 0
+
+
+def clear_request_cache():
+    """Drops all responses cached by make_request."""
+    global _response_cache_generation
+    with _response_cache_lock:
+        _response_cache.clear()
+        _response_cache_generation += 1
+
+
+def make_request(endpoint, method='GET', data=None, files=None, workaround=None, params=None, cache_ttl=0):
     """Makes an authenticated request to the specified endpoint of the Nerve management system.
 
     Parameters:
@@ -99,6 +139,9 @@ def make_request(endpoint, method='GET', data=None, files=None, workaround=None)
     - workaround: Injects the session ID into the data as SessionToken, if "Inject_Session_Token_To_Controller_Call" 
       is given. This is a workaround to avoid the need of putting the sessionId in the operative level of the function
       calls.
+    - params: The query parameters as dictionary. They are URL-encoded and appended to the endpoint.
+    - cache_ttl: For GET requests, the number of seconds a successful response may be reused for the same request.
+      The default of 0 always sends the request.
 
     Returns:
     - The response from the server.
@@ -109,14 +152,20 @@ def make_request(endpoint, method='GET', data=None, files=None, workaround=None)
         raise ActionUnsuccessful("Please log in.")
     
 
-    headers = {'sessionId': session_id,
-               'Sec-Fetch-Dest': 'empty',
-               'Sec-Fetch-Mode': 'cors',
-               'Sec-Fetch-Site': 'same-origin'
-               }
+    headers = {'sessionId': session_id}
 
     url = f"{base_url}{endpoint}"
 
+    if method != 'GET':
+        clear_request_cache()
+    elif cache_ttl > 0:
+        cache_key = (session_id, url, tuple(sorted((params or {}).items())))
+        with _response_cache_lock:
+            cached = _response_cache.get(cache_key)
+            generation = _response_cache_generation
+        if cached and time.monotonic() - cached[0] < cache_ttl:
+            return cached[1]
+
     if workaround:
         if workaround == "Inject_Session_Token_To_Controller_Call":
             if data:
@@ -126,10 +175,12 @@ def make_request(endpoint, method='GET', data=None, files=None, workaround=None)
 
     def send_request(headers, data=None, files=None):
         if files:
+            # Only file uploads need the multipart encoder, so it is not imported for every other command.
+            from requests_toolbelt.multipart.encoder import MultipartEncoder
             fields = {}
             if data:
                 # Omit filename for JSON part
-                fields['data'] = ('', json.dumps(data), 'application/json')
+                fields['data'] = ('', encode_json(data), 'application/json')
             for key, file_content in files.items():
                 fields[key] = file_content  # Add files to the request
 
@@ -137,13 +188,13 @@ def make_request(endpoint, method='GET', data=None, files=None, workaround=None)
             # Set the correct content-type for the multipart request
             headers['Content-Type'] = m.content_type
             body = m
-            return requests.request(method, url, headers=headers, data=body)
+            return _session.request(method, url, headers=headers, data=body, params=params)
         else:
             if data:
                 # Explicitly set Content-Type for JSON data
                 headers['Content-Type'] = 'application/json'
-                data = json.dumps(data)
-            return requests.request(method, url, headers=headers, data=data)
+                data = encode_json(data)
+            return _session.request(method, url, headers=headers, data=data, params=params)
 
     # Attempt to send the initial request
     response = send_request(headers, data, files)
@@ -152,6 +203,14 @@ def make_request(endpoint, method='GET', data=None, files=None, workaround=None)
     if response.status_code == 401:
         print("Session does not work anymore. Please log-in.")
 
+    if method != 'GET':
+        # GET requests sent while this request was processed may still have seen the old state.
+        clear_request_cache()
+    elif cache_ttl > 0 and response:
+        with _response_cache_lock:
+            if generation == _response_cache_generation:
+                _response_cache[cache_key] = (time.monotonic(), response)
+
     return response
 
 
@@ -18,10 +18,29 @@
 # TTTech Industrial Automation AG, Schoenbrunnerstrasse 7, 1040 Vienna, Austria
 """Miscellaneous utility functions."""
 
-import configparser
+import functools
+import hashlib
 import json
+import os
 import re
-import pprint
+import time
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library json module is used as fallback
+    orjson = None
+
+
+def _cache_dir() -> Path:
+    """Returns the directory holding data of the management system which is cached between invocations.
+
+    It is only resolved when the cache is used, so commands without a cache work without a home directory.
+
+    Raises:
+    - RuntimeError: If the home directory cannot be determined.
+    """
+    return Path.home() / ".cache" / "nerveapi"
 
 
 def save_credentials(url: str, username: str, password: str, filename: str = 'credentials.ini'):
@@ -33,17 +52,7 @@ def save_credentials(url: str, username: str, password: str, filename: str = 'cr
     - password: API password.
     - filename: Filename for storing the credentials.
     """
-    config = configparser.ConfigParser()
-    config['Credentials'] = {}
-    if url:
-        config['Credentials']['url'] = url
-    if username:
-        config['Credentials']['username'] = username
-    if password:
-        config['Credentials']['password'] = password
-
-    with open(filename, 'w') as configfile:
-        config.write(configfile)
+    _write_ini_section(filename, 'Credentials', {'url': url, 'username': username, 'password': password})
 
 
 def load_credentials_from_file(filename: str = 'credentials.ini') -> tuple:
@@ -55,17 +64,21 @@ def load_credentials_from_file(filename: str = 'credentials.ini') -> tuple:
     Returns:
     A tuple containing URL, username, and password. If the file or section is not found, returns (None, None, None).
     """
-    config = configparser.ConfigParser()
-    config.read(filename)
-    url = None
-    username = None
-    password = None
+    try:
+        mtime_ns = os.stat(filename).st_mtime_ns
+    except OSError:
+        return None, None, None
+    return _load_credentials(filename, mtime_ns)
 
-    if 'Credentials' in config:
-        url = config['Credentials'].get('url')
-        username = config['Credentials'].get('username')
-        password = config['Credentials'].get('password')
-    return url, username, password
+
+# The modification time is part of the key, so a changed file is parsed again. The result is an immutable tuple and
+# can be handed out to several callers. load_json is not cached since its callers modify the returned data.
+@functools.lru_cache(maxsize=32)
+def _load_credentials(filename: str, mtime_ns: int) -> tuple:
+    credentials = _read_ini_section(filename, 'Credentials')
+    if credentials is None:
+        return None, None, None
+    return credentials.get('url'), credentials.get('username'), credentials.get('password')
 
 
 def load_session_id(filename: str = 'session_id.ini') -> tuple:
@@ -77,15 +90,80 @@ def load_session_id(filename: str = 'session_id.ini') -> tuple:
     Returns:
     The session ID as a string, or None if not found.
     """
-    config = configparser.ConfigParser()
-    config.read(filename)
-    if 'Session' in config:
-        session_id = config['Session'].get('sessionid')
-        base_url = config['Session'].get('baseurl')
-        return (session_id,base_url)
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return (None,None)
+    return _load_session_id(filename, stat.st_mtime_ns, stat.st_size)
+
+
+# Every request to the MS needs the session ID, so the file is only parsed again when it was changed. Like for the
+# credentials, the modification time is part of the key. save_session_id clears the cache as well, in case the file is
+# rewritten within the resolution of the timestamp.
+@functools.lru_cache(maxsize=8)
+def _load_session_id(filename: str, mtime_ns: int, size: int) -> tuple:
+    session = _read_ini_section(filename, 'Session')
+    if session is not None:
+        return (session.get('sessionid'), session.get('baseurl'))
     return (None,None)
 
 
+_INI_SECTION_RE = re.compile(r'^\[([^\]]+)\]\s*$')
+_INI_KEY_VALUE_RE = re.compile(r'^\s*([^=:\s]+)\s*[=:]\s*(.*?)\s*$')
+
+
+def _write_ini_section(filename: str, section: str, values: dict, keep_empty: bool = False):
+    """Writes one section of 'key = value' lines in the format read by _read_ini_section.
+
+    Values which are empty or None are left out, unless keep_empty is set.
+
+    Raises:
+    - ValueError: If a value contains a line break, which cannot be stored in a single line.
+    """
+    lines = [f"[{section}]\n"]
+    for key, value in values.items():
+        if not value and not keep_empty:
+            continue
+        value = value or ''
+        if '\n' in value or '\r' in value:
+            raise ValueError(f"The {key} must not contain line breaks.")
+        lines.append(f"{key} = {value}\n")
+    with open(filename, 'w') as ini_file:
+        ini_file.write("".join(lines) + "\n")
+
+
+def _read_ini_section(filename: str, section: str) -> dict:
+    """Reads the keys and values of one section of an INI file.
+
+    The files written by this module only hold one section with a few 'key = value' lines, so the reader does
+    without the interpolation and multi-line values of configparser. Like configparser, keys are lower case.
+
+    Returns:
+    A dictionary with the values of the section, or None if the file or the section does not exist.
+    """
+    try:
+        with open(filename) as ini_file:
+            lines = ini_file.readlines()
+    except OSError:
+        return None
+
+    values = None
+    in_section = False
+    for line in lines:
+        if line.lstrip().startswith(('#', ';')):
+            continue
+        header = _INI_SECTION_RE.match(line)
+        if header:
+            in_section = header.group(1) == section
+            if in_section and values is None:
+                values = {}
+        elif in_section:
+            key_value = _INI_KEY_VALUE_RE.match(line)
+            if key_value:
+                values[key_value.group(1).lower()] = key_value.group(2)
+    return values
+
+
 def save_json(wl_info, filename: str):
     """Saves workload information to a file in JSON format.
 
@@ -93,8 +171,62 @@ def save_json(wl_info, filename: str):
     - wl_info: A list of dictionaries containing workload information.
     - filename: The name of the file to save the information to.
     """
-    with open(filename, 'w') as output_file:
-        json.dump(wl_info, output_file, indent=4)
+    Path(filename).write_bytes(_dump_json(wl_info))
+
+
+def append_json(items: list, filename: str) -> bool:
+    """Appends items to a list stored in a file in JSON format, without reading and parsing the whole file.
+
+    Only the end of the file is inspected to find the closing bracket of the list, the new items are written in
+    its place.
+
+    Parameters:
+    - items: A list of dictionaries to append.
+    - filename: The name of the file holding the list.
+
+    Returns:
+    True if the items were appended, False if the file does not end with a list. The file is not changed then.
+    """
+    with open(filename, 'r+b') as output_file:
+        size = output_file.seek(0, os.SEEK_END)
+        tail_start = max(0, size - 4096)
+        output_file.seek(tail_start)
+        tail = output_file.read().rstrip()
+        if not tail.endswith(b"]"):
+            return False
+        head = tail[:-1].rstrip()
+        if not head:
+            return False
+        if not items:
+            return True
+        # Strip the brackets of the serialized items, so they can be written as continuation of the list.
+        content = _dump_json(items).strip()[1:-1].rstrip()
+        separator = b"" if head.endswith(b"[") else b","
+        output_file.seek(tail_start + len(head))
+        output_file.truncate()
+        output_file.write(separator + content + b"\n]\n")
+    return True
+
+
+def _dump_json(data) -> bytes:
+    """Serializes data to JSON indented by four spaces and ending with a newline."""
+    # orjson can only indent by two spaces. The files are meant to be read and kept by users, so their format
+    # stays the same and the json module writes them.
+    return json.dumps(data, indent=4).encode() + b"\n"
+
+
+def encode_json(data) -> bytes:
+    """Serializes data to compact JSON bytes, e.g. for request bodies, with orjson if available."""
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data).encode()
+
+
+def parse_json(content):
+    """Decodes JSON from bytes or a string, with orjson if available."""
+    if orjson:
+        return orjson.loads(content)
+    return json.loads(content)
 
 
 def load_json(filename: str):
@@ -106,8 +238,55 @@ def load_json(filename: str):
     Returns:
     A list of dictionaries containing workload information.
     """
-    with open(filename, 'r') as input_file:
-        return json.load(input_file)
+    return parse_json(Path(filename).read_bytes())
+
+
+def _cache_file(name: str, key: str) -> tuple:
+    """Returns the path of a cache file and the hash of its key. Each key gets a file of its own."""
+    key_hash = hashlib.sha256(key.encode()).hexdigest()
+    return _cache_dir() / f"{name}-{key_hash[:16]}.json", key_hash
+
+
+def load_cache(name: str, key: str, max_age: float):
+    """Loads data which was cached on disk with save_cache.
+
+    Parameters:
+    - name: The name of the cached data, e.g. "nodes".
+    - key: Identifies what the data belongs to, e.g. the base URL of the management system.
+    - max_age: The maximum age of the cached data in seconds.
+
+    Returns:
+    The cached data, or None if there is no cached data for the key younger than max_age.
+    """
+    try:
+        path, key_hash = _cache_file(name, key)
+        if time.time() - path.stat().st_mtime > max_age:
+            return None
+        entry = load_json(path)
+    except (OSError, ValueError, RuntimeError):
+        return None
+    if not isinstance(entry, dict) or entry.get("key") != key_hash:
+        return None
+    return entry.get("data")
+
+
+def save_cache(name: str, key: str, data):
+    """Caches data of the management system on disk, so it can be reused by later invocations.
+
+    Caching is best effort. If the cache directory cannot be determined or written, nothing is cached.
+
+    Parameters:
+    - name: The name of the cached data, e.g. "nodes".
+    - key: Identifies what the data belongs to, e.g. the base URL of the management system. Only a hash of it is
+      stored, so it may contain a session ID.
+    - data: The data to cache. Must be serializable to JSON.
+    """
+    try:
+        path, key_hash = _cache_file(name, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        save_json({"key": key_hash, "data": data}, path)
+    except (OSError, RuntimeError):
+        pass
 
 
 def save_session_id(session_id: str, base_url: str, filename: str = 'session_id.ini'):
@@ -118,33 +297,85 @@ def save_session_id(session_id: str, base_url: str, filename: str = 'session_id.
     - base_url: The base URL to save.
     - filename: The name of the file to save the session ID to.
     """
-    config = configparser.ConfigParser()
-    config['Session'] = {'sessionid': session_id,
-                            'baseurl': base_url}
-    with open(filename, 'w') as configfile:
-        config.write(configfile)
+    # logout saves empty values to clear the session, so empty values are written as well.
+    _write_ini_section(filename, 'Session', {'sessionid': session_id, 'baseurl': base_url}, keep_empty=True)
+    _load_session_id.cache_clear()
+
+
+# Characters which have a special meaning in a regular expression.
+_REGEX_METACHARACTERS = frozenset('.^$*+?{}[]|()\\')
+
+
+class _LiteralPattern:
+    """Stands in for a compiled pattern whose matches have to start with a literal string.
+
+    The cheap prefix comparison rejects most strings. Only if a regex is given it is run on the remaining
+    strings to check the rest of the pattern, e.g. the word boundaries of plain filters.
+    """
+    __slots__ = ("literal", "regex")
+
+    def __init__(self, literal: str, regex: re.Pattern = None):
+        self.literal = literal
+        self.regex = regex
+
+    def match(self, string: str):
+        """Returns a truthy value if the string matches, like re.Pattern.match."""
+        if not string.startswith(self.literal):
+            return None
+        return self.regex.match(string) if self.regex is not None else True
+
+
+# Patterns which are known in advance and compiled at import time. Unset filters match anything.
+_MATCH_ANYTHING = re.compile(".*")
+_PRECOMPILED = {
+    None: _MATCH_ANYTHING,
+    "regex:.*": _MATCH_ANYTHING,
+}
 
 
-def create_regex(pattern: str) -> re.Pattern:
+def _regex_body(pattern: str) -> str:
+    """Returns the regular expression create_regex uses for a single pattern string."""
+    if pattern.startswith("regex:"):
+        return pattern[len("regex:"):]
+    return r"\b" + re.escape(pattern) + r"\b"
+
+
+# The same filters are used again and again, e.g. for every node, so the compiled patterns are cached.
+@functools.lru_cache(maxsize=256)
+def create_regex(pattern: str, flags: int = 0) -> re.Pattern:
     """Creates a regex pattern from the given pattern string.
 
+    Plain strings and regular expressions without any special characters are matched with a string
+    comparison instead of the regex engine.
+
     Parameters:
     - pattern: The pattern string. Can be a regular expression or a plain string. If None, matches anything.
+      A tuple of pattern strings matches if any of them matches. They are combined into one regular expression.
+    - flags: Flags for re.compile. re.ASCII makes the regex engine faster for fields which only hold ASCII
+      characters, such as IDs.
 
     Returns:
-    A compiled regular expression object.
+    A compiled regular expression object, or an object with the same match method.
     """
-    if pattern is None:
-        regex_pattern = ".*"
+    if pattern in _PRECOMPILED:
+        return _PRECOMPILED[pattern]
+    if isinstance(pattern, tuple):
+        if len(pattern) == 1:
+            return create_regex(pattern[0], flags)
+        # One alternation is matched in a single pass, instead of trying each pattern on its own.
+        regex_pattern = "|".join(f"(?:{_regex_body(p)})" for p in pattern)
     elif pattern.startswith("regex:"):
         regex_pattern = pattern[len("regex:"):]
+        if _REGEX_METACHARACTERS.isdisjoint(regex_pattern):
+            return _LiteralPattern(regex_pattern)
     else:
         regex_pattern = r"\b" + re.escape(pattern) + r"\b"
+        return _LiteralPattern(pattern, re.compile(regex_pattern, flags))
     try:
-        return re.compile(regex_pattern)
+        return re.compile(regex_pattern, flags)
     except re.error as e:
         print(f"Ignoring invalid regex pattern: {regex_pattern}. Error: {e}")
-        return re.compile(".*")
+        return _MATCH_ANYTHING
 
 
 def append_ending(filename: str, ending: str) -> str:
@@ -160,6 +391,18 @@ def append_ending(filename: str, ending: str) -> str:
     return filename if filename.endswith(ending) else filename + ending
 
 
+def plural(count: int) -> str:
+    """Returns the suffix for the plural of a noun in a message.
+
+    Parameters:
+    - count: The number of items the noun refers to.
+
+    Returns:
+    An empty string for exactly one item, "s" otherwise.
+    """
+    return "" if count == 1 else "s"
+
+
 def rename_dict_field(d: dict, old_field: str, new_field: str):
     """Renames a field in a dictionary.
 
@@ -203,7 +446,8 @@ def serverMessage(response) -> str:
             return json_content.get('message', "No message returned.")
     except ValueError:
         pass
-    return "Server response: " + pprint.pformat(response)
+    # The representation of a response is short, e.g. "<Response [502]>", but cut it anyway.
+    return f"Server response: {response!r}"[:1024]
 
 
 def complainIfKeysAreNotInDict(d: dict, keys: list):
@@ -213,8 +457,10 @@ def complainIfKeysAreNotInDict(d: dict, keys: list):
     - d: The dictionary to check.
     - keys: A list of keys to check for in the dictionary.
     """
-    missing_keys = [key for key in keys if key not in d]
-    if missing_keys:
+    # The set difference runs in C. Only on the error path the missing keys are put back into the given order.
+    missing = set(keys).difference(d)
+    if missing:
+        missing_keys = [key for key in keys if key in missing]
         raise DataNotAsExpected(
             f"Missing expected keys: {', '.join(missing_keys)}")
 
@@ -236,6 +482,8 @@ def complainIfNotAList(d, length=None):
 def findDictByValue(d: list, key: str, value: str) -> dict:
     """Finds a dictionary in a list of dictionaries by a specific value.
 
+    This is a linear scan. When a list is searched more than once, index it with build_index instead.
+
     Parameters:
     - d: The list of dictionaries to search.
     - key: The key to search for.
@@ -244,7 +492,23 @@ def findDictByValue(d: list, key: str, value: str) -> dict:
     Returns:
     The dictionary containing the specified value, or None if not found.
     """
-    for item in d:
-        if item.get(key) == value:
-            return item
-    return None
+    return next((item for item in d if item.get(key) == value), None)
+
+
+def build_index(items: list, key: str) -> dict:
+    """Indexes a list of dictionaries by the value of a key, for repeated lookups with index.get(value).
+
+    Dictionaries without the key are left out. Like findDictByValue, the first dictionary with a given value wins.
+
+    Parameters:
+    - items: The list of dictionaries to index.
+    - key: The key whose values are used for the index.
+
+    Returns:
+    A dictionary mapping the values to the dictionaries of the list.
+    """
+    index = {}
+    for item in items:
+        if key in item:
+            index.setdefault(item[key], item)
+    return index
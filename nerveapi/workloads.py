@@ -18,11 +18,14 @@
 # TTTech Industrial Automation AG, Schoenbrunnerstrasse 7, 1040 Vienna, Austria
 """Workload Handling."""
 
-from typing import List, Optional
-from dataclasses import asdict
+from typing import List, Optional, Union
+from dataclasses import asdict, fields, is_dataclass
+import json
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-from .session import make_request
+from .session import make_request, MAX_PARALLEL_REQUESTS
 from .datastructures import (
     Workload_Definition,
     WorkloadVersion_Docker_Definition,
@@ -30,7 +33,14 @@ from .datastructures import (
     UploadFile,
     DockerRepoPath,
 )
-from .utils import create_regex, ActionUnsuccessful, serverMessage, complainIfKeysAreNotInDict, complainIfNotAList
+from .utils import (
+    create_regex, ActionUnsuccessful, serverMessage, complainIfKeysAreNotInDict, complainIfNotAList, parse_json
+)
+
+# Number of workloads requested with the first request of list_workloads.
+WORKLOAD_PAGE_LIMIT = 10000
+# Seconds for which the workload list and details are reused, so bursts of calls don't ask the MS again.
+WORKLOAD_CACHE_TTL = 2.0
 
 
 def list_workloads(verbose: bool = False) -> List[dict]:
@@ -40,37 +50,46 @@ def list_workloads(verbose: bool = False) -> List[dict]:
     :return: A list of workload dictionaries.
     """
     #
-    response = make_request("/nerve/v2/workloads")
+    # Ask for a large page right away. Only if the MS has even more workloads, a second request fetches all of them.
+    response = make_request("/nerve/v2/workloads", params={"limit": WORKLOAD_PAGE_LIMIT}, cache_ttl=WORKLOAD_CACHE_TTL)
     if not response:
         raise ActionUnsuccessful(f"Could not retrieve list of workloads. {serverMessage(response)}")
-    wl_response = response.json()
-    # Use the number of workloads returned.
+    wl_response = parse_json(response.content)
     count = wl_response.get("count", 0)
     if verbose:
         print(f"Will try to fetch a total of {count} workloads")
 
-    response = make_request(f"/nerve/v2/workloads?limit={count}")
-    if not response:
-        raise ActionUnsuccessful(f"Could not retrieve list of workloads. {serverMessage(response)}")
+    wl_list_json = wl_response.get("data", [])
+    if len(wl_list_json) < count:
+        response = make_request("/nerve/v2/workloads", params={"limit": count}, cache_ttl=WORKLOAD_CACHE_TTL)
+        if not response:
+            raise ActionUnsuccessful(f"Could not retrieve list of workloads. {serverMessage(response)}")
+        wl_list_json = parse_json(response.content).get("data", [])
 
-    wl_list_json = response.json().get("data", [])
     if verbose:
         print(f"Got {len(wl_list_json)} workloads")
 
     return wl_list_json
 
 
+def _create_regex_for(pattern, flags: int = 0):
+    """Creates the pattern for a filter given as string or as list of strings, see create_regex."""
+    return create_regex(tuple(pattern) if isinstance(pattern, list) else pattern, flags=flags)
+
+
 def filter_workloads(
     workloads: List[dict],
-    name: Optional[str] = None,
-    _id: Optional[str] = None,
+    name: Optional[Union[str, List[str]]] = None,
+    _id: Optional[Union[str, List[str]]] = None,
     _type: Optional[str] = None,
     show_disabled: Optional[bool] = None,
-    version_name: Optional[str] = None,
-    version_id: Optional[str] = None,
+    version_name: Optional[Union[str, List[str]]] = None,
+    version_id: Optional[Union[str, List[str]]] = None,
 ) -> List[dict]:
     """Filters workloads based on provided criteria.
 
+    The name, ID and version filters can also be lists of patterns. A value matches if it matches any of them.
+
     :param workloads: A list of workloads to filter.
     :param name: Name of the workload to match (supports regex).
     :param _id: ID of the workload to match (supports regex).
@@ -86,43 +105,76 @@ def filter_workloads(
         return []
     complainIfNotAList(workloads)
 
-    name_pattern = create_regex(name)
-    id_pattern = create_regex(_id)
-    version_name_pattern = create_regex(version_name)
-    version_id_pattern = create_regex(version_id)
+    name_pattern = _create_regex_for(name)
+    # IDs are ASCII only, so their patterns can use the faster ASCII matching.
+    id_pattern = _create_regex_for(_id, re.ASCII)
+    version_name_pattern = _create_regex_for(version_name)
+    version_id_pattern = _create_regex_for(version_id, re.ASCII)
     filtered_workloads = []
 
     for workload in workloads:
+        # The flag and the type are compared first, they are much cheaper than matching the patterns.
+        # They are only read if their filter is set, not every workload entry has them.
         if (
-            name_pattern.match(workload["name"])
-            and id_pattern.match(workload["_id"])
+            (show_disabled or not workload["disabled"])
             and (not _type or _type == workload["type"])
-            and (show_disabled or not workload["disabled"])
+            and name_pattern.match(workload["name"])
+            and id_pattern.match(workload["_id"])
         ):
             if version_name:
                 filtered_versions = []
                 for version in workload.get("versions", []):
-                    if version_name_pattern.match(version.get("name", "")) and version_id_pattern.match(
-                        version.get("_id", "")
+                    # An unset version ID filter matches anything and is not checked.
+                    if version_name_pattern.match(version.get("name", "")) and (
+                        version_id is None or version_id_pattern.match(version.get("_id", ""))
                     ):
                         filtered_versions.append(version)
                 if filtered_versions:
-                    workload["versions"] = filtered_versions
-                    filtered_workloads.append(workload)
+                    # A shallow copy carries the filtered versions, the caller's workload stays untouched.
+                    filtered_workloads.append({**workload, "versions": filtered_versions})
             else:
                 filtered_workloads.append(workload)
 
     return filtered_workloads
 
 
+def select_versions(
+    workload: dict, version_name: Optional[str] = None, version_id: Optional[str] = None
+) -> Optional[dict]:
+    """Restricts the versions of a workload to those matching the version filters.
+
+    Like in filter_workloads, the version filters are only applied if a version name is given.
+
+    :param workload: The workload, including its versions.
+    :param version_name: Version name to match (supports regex).
+    :param version_id: Version ID to match (supports regex).
+    :return: A shallow copy of the workload holding only the matching versions, or None if no version matches.
+             Without version filters, the workload itself is returned.
+    """
+    #
+    if not version_name:
+        return workload
+    version_name_pattern = create_regex(version_name)
+    version_id_pattern = create_regex(version_id, flags=re.ASCII)
+    filtered_versions = [
+        version
+        for version in workload.get("versions", [])
+        if version_name_pattern.match(version.get("name", "")) and version_id_pattern.match(version.get("_id", ""))
+    ]
+    if not filtered_versions:
+        return None
+    return {**workload, "versions": filtered_versions}
+
+
 def get_workload_info(
-    _id: Optional[str] = None, name: Optional[str] = None, versions: Optional[list] = None
+    _id: Optional[str] = None, name: Optional[str] = None, versions: Optional[list] = None, cached: bool = True
 ) -> Optional[dict]:
     """Retrieves workload information by ID or name.
 
     :param _id: The ID of the workload to retrieve.
     :param name: The name of the workload to retrieve. Can be used instead of ID.
     :versions: A list of versions, where only the _id is taken into consideration to filter the versions.
+    :param cached: If False, the details are requested even if they were fetched within WORKLOAD_CACHE_TTL.
     :return: The workload information dictionary or None if not found.
     """
     #
@@ -130,38 +182,69 @@ def get_workload_info(
         raise ActionUnsuccessful("Specify either an ID or a name, not both or neither.")
 
     if _id:
-        response = make_request(f"/nerve/v2/workloads/{_id}")
+        response = make_request(f"/nerve/v2/workloads/{_id}", cache_ttl=WORKLOAD_CACHE_TTL if cached else 0)
         if not response:
             raise ActionUnsuccessful(
                 f"Could not retrieve details for workload with ID {_id}. " +
                 f"The server responded: {serverMessage(response)}"
             )
-        wl = response.json()
+        wl = parse_json(response.content)
     else:
         # get the list filtered by name
-        response = make_request(f'/nerve/v2/workloads?filterBy={{"name":"{name}"}}')
-        json_response = response.json()
+        name_filter = json.dumps({"name": name}, separators=(",", ":"))
+        response = make_request("/nerve/v2/workloads", params={"filterBy": name_filter})
+        json_response = parse_json(response.content)
         complainIfKeysAreNotInDict(json_response, ["data"])
         wl_list_json = json_response["data"]
-
-        wl_list_json = [wl for wl in wl_list_json if wl["name"] == name]
-        if len(wl_list_json) > 1:
+        # The MS filter also returns workloads which only contain the name. If they don't fit on the first page,
+        # the exact match could be missing, so all of them are requested.
+        count = json_response.get("count", 0)
+        if len(wl_list_json) < count:
+            response = make_request("/nerve/v2/workloads", params={"filterBy": name_filter, "limit": count})
+            wl_list_json = parse_json(response.content).get("data", [])
+
+        # Stop at the first exact match, and only look on for a second one to detect duplicates.
+        matches = (wl for wl in wl_list_json if wl["name"] == name)
+        wl = next(matches, None)
+        if wl is None:
+            return None
+        if next(matches, None) is not None:
             raise ActionUnsuccessful(
                 f"Multiple workloads found with name {name}. Cannot proceed, please use id instead."
             )
-        if len(wl_list_json) == 0:
-            return None
-        wl = wl_list_json[0]
 
     if versions:
-        # Reformat the versions list to a list containing the ids only.
-        version_ids = [version["_id"] for version in versions]
+        # Reformat the versions list to a set containing the ids only, for constant time lookups.
+        version_ids = {version["_id"] for version in versions}
 
         wl["versions"] = [version for version in wl["versions"] if version["_id"] in version_ids]
 
     return wl
 
 
+def get_workload_infos(ids: List[str], cached: bool = True) -> dict:
+    """Retrieves the workload information of several workloads concurrently.
+
+    A failure does not stop the retrieval of the other workloads.
+
+    :param ids: The IDs of the workloads to retrieve. Duplicates are requested once.
+    :param cached: Passed on to get_workload_info.
+    :return: A dictionary keyed by ID. The value is the workload information dictionary, or the
+             ActionUnsuccessful exception describing why it could not be retrieved.
+    """
+    def try_get(_id):
+        try:
+            return get_workload_info(_id=_id, cached=cached)
+        except ActionUnsuccessful as e:
+            return e
+
+    unique_ids = list(dict.fromkeys(ids))
+    if not unique_ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_REQUESTS, len(unique_ids))) as executor:
+        return dict(zip(unique_ids, executor.map(try_get, unique_ids)))
+
+
 def create_workload_in_ms(
     wl_definition: Workload_Definition, sequential: bool = False, verbose: bool = False
 ) -> Optional[str]:
@@ -187,13 +270,21 @@ def create_workload_in_ms(
         if verbose:
             print(f"Workload {wl_definition.name} already exists in ms. Skipped creation.")
     _id = wl_info["_id"]
+    # The name lookup only returns a summary, but the versions are added on top of the full details.
+    # They are fetched once here instead of once per version.
+    wl_info = get_workload_info(_id=_id)
+    if not wl_info:
+        print(f"Workload {wl_definition.name} not found. Cannot add versions.")
+        return None
 
     # Now we can add the versions.
     if wl_definition.type == "docker":
+        # Each PATCH sends the whole workload, so the versions are added one after the other. This keeps the
+        # order of the template, and the first failure stops the remaining versions.
         for version_def in wl_definition.versions:
             if verbose:
                 print(f"Adding version {version_def.name} to workload {wl_definition.name}.")
-            add_workload_version_in_ms(_id, version_def, sequential, verbose)
+            add_workload_version_in_ms(_id, version_def, sequential, verbose, wl_info=wl_info)
         return _id
     else:
         raise ActionUnsuccessful("Only Docker type is supported right now.")
@@ -208,7 +299,7 @@ def create_workload_without_versions_in_ms(wl_definition: Workload_Definition, v
     """
     #
     if wl_definition.type == "docker":
-        wl_as_dict = asdict(wl_definition)
+        wl_as_dict = _shallow_dict(wl_definition, skip=("versions",))
         wl_as_dict["versions"] = []
 
         files = {
@@ -224,11 +315,15 @@ def create_workload_without_versions_in_ms(wl_definition: Workload_Definition, v
         if verbose:
             print(f"Workload {wl_definition.name} created successfully.")
 
-        return response.json()
+        return parse_json(response.content)
 
 
 def add_workload_version_in_ms(
-    wl_id: str, wl_version_def: WorkloadVersion_Docker_Definition, sequential: bool = False, verbose: bool = False
+    wl_id: str,
+    wl_version_def: WorkloadVersion_Docker_Definition,
+    sequential: bool = False,
+    verbose: bool = False,
+    wl_info: Optional[dict] = None,
 ) -> Optional[str]:
     """Adds a version to an existing workload.
 
@@ -236,14 +331,20 @@ def add_workload_version_in_ms(
     :param wl_version_def: The version definition.
     :param sequential: If True, waits for the download to complete before returning.
     :param verbose: If True, prints additional information during execution.
+    :param wl_info: The workload details as returned by get_workload_info(_id=wl_id), if the caller already has
+                    them. Summaries from the workload list or the creation response are not enough. If not given,
+                    the details are fetched from the MS.
     :return: The workload ID on success, or None if sequential mode is not used.
     """
     #
     # This function takes the current workload info, modifies it and sends it back to the server. This results in a new 
     # version being added.
-    wl_info = get_workload_info(_id=wl_id)  # First, get the current workload information to modify it.
-    if not wl_info:
-        raise ActionUnsuccessful(f"Workload {wl_id} not found. Cannot add version.")
+    if wl_info is None:
+        wl_info = get_workload_info(_id=wl_id)  # First, get the current workload information to modify it.
+        if not wl_info:
+            raise ActionUnsuccessful(f"Workload {wl_id} not found. Cannot add version.")
+    # Only the versions are replaced below, so a shallow copy keeps the caller's workload info intact.
+    wl_info = dict(wl_info)
 
     if wl_info["type"] == "docker":
         prepare_docker_version_dict_from_wl_def(wl_version_def, wl_info)
@@ -274,13 +375,15 @@ def wait_for_completion_of_workload_version_download(wl_id: str) -> str:
     :param wl_id: The ID of the workload.
     :return: The ID of the workload.
     """
-    time_still_left = 300
+    # Poll quickly at first, so short downloads are noticed soon, then back off to spare the MS.
+    deadline = time.monotonic() + 300
+    delay = 0.5
     print("Downloading", end="", flush=True)
     while True:
-        time.sleep(1)
+        time.sleep(delay)
+        delay = min(delay * 1.5, 15)
         print(".", end="", flush=True)
-        time_still_left -= 1
-        wl_info = get_workload_info(_id=wl_id)
+        wl_info = get_workload_info(_id=wl_id, cached=False)
         if not wl_info:
             print("")
             raise ActionUnsuccessful(f"Unexpected issue: cannot get info for workload {wl_id} anymore.")
@@ -288,12 +391,36 @@ def wait_for_completion_of_workload_version_download(wl_id: str) -> str:
         if not the_added_wl_version.get("isDownloading", False):
             print("\nWorkload version download complete.")
             break
-        if time_still_left == 0:
+        if time.monotonic() >= deadline:
             print("\nWorkload version download timeout. Won't wait any longer, but download will continue.")
             break
     return wl_id
 
 
+def _shallow_dict(dc, skip: tuple = (), replace: Optional[dict] = None) -> dict:
+    """Converts a dataclass to a dictionary like asdict, but without converting the fields in skip at all.
+
+    :param dc: The dataclass instance.
+    :param skip: The names of the fields to leave out.
+    :param replace: Values to use for some fields instead of converting them. The field order is kept.
+    :return: The dictionary. Nested dataclasses, also in lists, are converted with asdict.
+    """
+    result = {}
+    for f in fields(dc):
+        if f.name in skip:
+            continue
+        if replace and f.name in replace:
+            result[f.name] = replace[f.name]
+            continue
+        value = getattr(dc, f.name)
+        if is_dataclass(value):
+            value = asdict(value)
+        elif isinstance(value, list):
+            value = [asdict(item) if is_dataclass(item) else item for item in value]
+        result[f.name] = value
+    return result
+
+
 def prepare_docker_version_dict_from_wl_def(wl_version_def, wl_info):
     """Prepares a dictionary for a Docker workload version definition.
 
@@ -301,15 +428,15 @@ def prepare_docker_version_dict_from_wl_def(wl_version_def, wl_info):
     :param wl_info: The workload information dictionary.
     """
     #
-    wl_info["versions"] = [asdict(wl_version_def)]
+    # Leave out the limits if not set. The API cannot handle None values.
+    properties_def = wl_version_def.workloadProperties
+    properties = _shallow_dict(
+        properties_def,
+        skip=tuple(name for name in ("limit_memory", "limit_CPUs") if getattr(properties_def, name) is None),
+    )
+    wl_info["versions"] = [_shallow_dict(wl_version_def, skip=("source",), replace={"workloadProperties": properties})]
     wl_info["versions"][0]["releaseName"] = wl_version_def.name
 
-    # Remove limits from dict if not set. The API cannot handle None values.
-    if wl_info["versions"][0]["workloadProperties"]["limit_memory"] is None:
-        wl_info["versions"][0]["workloadProperties"].pop("limit_memory")
-    if wl_info["versions"][0]["workloadProperties"]["limit_CPUs"] is None:
-        wl_info["versions"][0]["workloadProperties"].pop("limit_CPUs")
-
     # Handle Docker repo path
     if isinstance(wl_version_def.source, DockerRepoPath):
         wl_info["versions"][0]["dockerFileOption"] = "path"
@@ -322,7 +449,6 @@ def prepare_docker_version_dict_from_wl_def(wl_version_def, wl_info):
         wl_info["versions"][0]["files"] = []
     elif isinstance(wl_version_def.source, UploadFile):
         raise ActionUnsuccessful("Uploading file not yet supported.")
-    wl_info["versions"][0].pop("source")
 
 
 def prepare_remote_connection_dict_from_wl_def(rc_def: RemoteConnection_Definition) -> dict: